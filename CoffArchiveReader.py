@@ -0,0 +1,114 @@
+import mmap
+import struct
+
+
+class CoffArchiveError(Exception):
+    pass
+
+
+class CoffArchiveReader:
+    """
+    Minimal reader for COFF archives (.lib files), as produced by MSVC.
+    Only the member headers are walked, member data is only looked at to detect
+    short import objects, see
+    https://docs.microsoft.com/en-us/windows/win32/debug/pe-format#archive-library-file-format
+    """
+    signature = b'!<arch>\n'
+    member_header = struct.Struct('16s12s6s6s8s10s2s')
+    # Sig1, Sig2, Version, Machine, TimeDateStamp, SizeOfData, OrdinalHint, Type
+    import_header = struct.Struct('<HHHHIIHH')
+
+    def __init__(self, lib_path: str):
+        self._lib_path = lib_path
+
+    def _members(self, data):
+        """Yields name and data range of every regular archive member"""
+        if data[:len(CoffArchiveReader.signature)] != CoffArchiveReader.signature:
+            raise CoffArchiveError('{} is not an archive'.format(self._lib_path))
+        long_names = b''
+        offset = len(CoffArchiveReader.signature)
+        while offset + CoffArchiveReader.member_header.size <= len(data):
+            name, _, _, _, _, size, end = CoffArchiveReader.member_header.unpack_from(
+                data, offset)
+            if end != b'`\n':
+                raise CoffArchiveError('Corrupt member header at offset {} in {}'.format(
+                    offset, self._lib_path))
+            try:
+                size = int(size.decode('ascii').strip())
+            except ValueError:
+                raise CoffArchiveError('Corrupt member size at offset {} in {}'.format(
+                    offset, self._lib_path))
+            start = offset + CoffArchiveReader.member_header.size
+            if start + size > len(data):
+                raise CoffArchiveError('Member at offset {} is truncated in {}'.format(
+                    offset, self._lib_path))
+            # Members are aligned on an even offset
+            offset = start + size + (size & 1)
+            name = name.decode('ascii', errors='replace').rstrip()
+            if name == '//':
+                long_names = data[start:start + size]
+            elif name.startswith('/<') or name == '/':
+                # Linker members, hybrid maps and EC symbol tables
+                continue
+            elif name.startswith('/'):
+                if not name[1:].isdigit():
+                    raise CoffArchiveError('Unknown member {} in {}'.format(name, self._lib_path))
+                # Long names are null terminated (MSVC) or newline terminated (GNU)
+                name_offset = int(name[1:])
+                name_end = len(long_names)
+                for terminator in (b'\0', b'\n'):
+                    found = long_names.find(terminator, name_offset)
+                    if 0 <= found < name_end:
+                        name_end = found
+                long_name = long_names[name_offset:name_end]
+                yield long_name.decode('utf-8', errors='replace').rstrip('/'), start, size
+            else:
+                yield name.rstrip('/'), start, size
+        if offset < len(data):
+            raise CoffArchiveError('Member header at offset {} is truncated in {}'.format(
+                offset, self._lib_path))
+
+    @staticmethod
+    def _import_dll_name(data, start, size):
+        """Returns the DLL name if the member is a short import object"""
+        header = CoffArchiveReader.import_header
+        if size < header.size:
+            return None
+        sig1, sig2, version = header.unpack_from(data, start)[0:3]
+        # Anonymous objects share the signatures but have a non-zero version
+        if sig1 != 0 or sig2 != 0xFFFF or version != 0:
+            return None
+        # Import name, followed by the DLL name, both null terminated
+        end = start + size
+        symbol_end = data.find(b'\0', start + header.size, end)
+        if symbol_end < 0:
+            return None
+        dll_end = data.find(b'\0', symbol_end + 1, end)
+        if dll_end < 0:
+            return None
+        return data[symbol_end + 1:dll_end].decode('utf-8', errors='replace')
+
+    def read_import_info(self):
+        """
+        Returns the name of the first member, as listed by lib /LIST, and the name of the
+        DLL that is imported, or None when the archive has no short import objects.
+        """
+        with open(self._lib_path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise CoffArchiveError('{} is empty'.format(self._lib_path))
+            with data:
+                first_member = None
+                for name, start, size in self._members(data):
+                    if first_member is None:
+                        first_member = name
+                        # Static libraries only contain objects, no need to look further
+                        if name.endswith('.obj'):
+                            return first_member, None
+                    dll_name = CoffArchiveReader._import_dll_name(data, start, size)
+                    if dll_name:
+                        return first_member, dll_name
+        if first_member is None:
+            raise CoffArchiveError('{} has no members'.format(self._lib_path))
+        return first_member, None
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class DeductionCache:
+    """
+    Persistent cache of import library deductions, stored as a JSON file.
+    Entries are keyed by the absolute library path. An entry is valid while the size
+    and modification time of the library file are unchanged, or when they changed but
+    the content hash is still the same.
+    """
+    # Bump when the layout of the stored import_lib_info changes
+    version = 2
+
+    def __init__(self, cache_file: str, max_size: int):
+        self._cache_file = cache_file
+        self._max_size = max_size
+        self._entries = None
+        self._fingerprints = {}
+        self._dirty = False
+        # Deductions run concurrently, guards the entries
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+            entries = {}
+            try:
+                with open(self._cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == DeductionCache.version:
+                    entries = data.get('entries', {})
+            except (OSError, ValueError):
+                # Missing or corrupt cache, start over
+                pass
+            self._entries = entries
+            return self._entries
+
+    @staticmethod
+    def _file_hash(lib_path: str) -> str:
+        sha = hashlib.sha256()
+        with open(lib_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _fingerprint(self, lib_path: str, stat: os.stat_result) -> dict:
+        # A library is looked up and then stored, only hash it once per run
+        if lib_path not in self._fingerprints:
+            self._fingerprints[lib_path] = {'size': stat.st_size,
+                                            'mtime': stat.st_mtime_ns,
+                                            'hash': DeductionCache._file_hash(lib_path)}
+        return self._fingerprints[lib_path]
+
+    def get(self, lib_path: str):
+        lib_path = os.path.abspath(lib_path)
+        entry = self._load().get(lib_path)
+        if entry is None:
+            return None
+        stat = os.stat(lib_path)
+        # Same size and mtime is a hit, the content is only hashed when they changed,
+        # e.g. after the package was restored or copied with the same bytes
+        if entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+            fingerprint = self._fingerprint(lib_path, stat)
+            if entry['hash'] != fingerprint['hash']:
+                return None
+            with self._lock:
+                entry.update(fingerprint)
+        info = entry['info']
+        # The dll lives next to the import library, make sure it did not go away
+        if info.get('dll_location') and not os.path.exists(info['dll_location']):
+            return None
+        with self._lock:
+            entry['last_used'] = time.time()
+            self._dirty = True
+        return dict(info)
+
+    def put(self, lib_path: str, info: dict):
+        lib_path = os.path.abspath(lib_path)
+        entry = dict(self._fingerprint(lib_path, os.stat(lib_path)))
+        entry['info'] = dict(info)
+        entry['last_used'] = time.time()
+        entries = self._load()
+        with self._lock:
+            entries[lib_path] = entry
+            self._dirty = True
+
+    def _evict(self):
+        sizes = {k: len(json.dumps({k: v})) for k, v in self._entries.items()}
+        total = sum(sizes.values())
+        # Least recently used entries go first
+        for key in sorted(self._entries, key=lambda k: self._entries[k]['last_used']):
+            if total <= self._max_size:
+                break
+            total -= sizes[key]
+            del self._entries[key]
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._evict()
+            folder = os.path.dirname(self._cache_file)
+            os.makedirs(folder, exist_ok=True)
+            # Write to a temporary file first, concurrent runs may share the cache
+            fd, tmp_file = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': DeductionCache.version, 'entries': self._entries}, f)
+            os.replace(tmp_file, self._cache_file)
+            self._dirty = False
@@ -0,0 +1,72 @@
+class PackageNode:
+    def __init__(self, pkg_name: str, filename: str, findname: str):
+        self.name = pkg_name
+        self.filename = filename
+        self.findname = findname
+        # Names of the packages that are public dependencies, without duplicates
+        self.public_deps = []
+        # Namespaced targets of the public dependencies, e.g. zlib::zlib
+        self.deps_names = []
+        # Position in the topological order, dependencies come first
+        self.position = None
+        # File names of the public dependencies, in topological order
+        self.public_deps_filenames = []
+
+
+class DependencyGraphIndex:
+    """
+    Names of all packages of the dependency graph and their topological order, resolved
+    once per run instead of for every package that requires them.
+    """
+
+    def __init__(self, generator, dependencies):
+        self.nodes = {}
+        for pkg_name, cpp_info in dependencies:
+            node = PackageNode(pkg_name, generator._get_filename(cpp_info),
+                               generator._get_name(cpp_info))
+            deps_names = {}
+            public_deps = {}
+            for require in generator.get_public_deps(cpp_info):
+                deps_names.setdefault("{}::{}".format(*generator._get_require_name(*require)))
+                public_deps.setdefault(require[0])
+            node.deps_names = list(deps_names)
+            node.public_deps = list(public_deps)
+            self.nodes[pkg_name] = node
+        self.order = self._topological_order()
+        for position, pkg_name in enumerate(self.order):
+            self.nodes[pkg_name].position = position
+        for node in self.nodes.values():
+            node.public_deps_filenames = [
+                self.nodes[dep].filename for dep in
+                sorted(node.public_deps, key=lambda dep: self.nodes[dep].position)]
+
+    def __getitem__(self, pkg_name: str) -> PackageNode:
+        return self.nodes[pkg_name]
+
+    def _topological_order(self) -> list:
+        """Depth first, dependencies before their dependents, ties in graph order"""
+        order = []
+        state = {}
+        for root in self.nodes:
+            if root in state:
+                continue
+            # Iterative, dependency chains can be deeper than the recursion limit
+            state[root] = 'visiting'
+            stack = [(root, iter(self.nodes[root].public_deps))]
+            while stack:
+                pkg_name, deps = stack[-1]
+                dep = next(deps, None)
+                if dep is None:
+                    stack.pop()
+                    state[pkg_name] = 'done'
+                    order.append(pkg_name)
+                elif dep not in state:
+                    if dep not in self.nodes:
+                        raise Exception("[DependencyGraphIndex] {} requires {}, which is not a "
+                                        "dependency".format(pkg_name, dep))
+                    state[dep] = 'visiting'
+                    stack.append((dep, iter(self.nodes[dep].public_deps)))
+                elif state[dep] == 'visiting':
+                    raise Exception("[DependencyGraphIndex] Dependency cycle through {} and {}".format(
+                        pkg_name, dep))
+        return order
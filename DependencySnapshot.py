@@ -0,0 +1,163 @@
+"""
+Regenerates the CMake files from a snapshot of the dependencies, without a Conan client
+or cache, e.g.
+
+    python DependencySnapshot.py conanbuildinfo.json --output-folder build/cmake
+
+Snapshots written by the json generator have no components nor requirements, the ones
+written by this generator with CONAN_CFP_SNAPSHOT have both.
+"""
+import argparse
+import json
+import os
+import sys
+
+from conans.errors import ConanException
+from conans.model.build_info import CppInfo, DepCppInfo, DepsCppInfo
+from conans.model.env_info import DepsEnvInfo, EnvInfo
+from conans.model.settings import Settings
+from conans.model.user_info import DepsUserInfo
+
+
+class SnapshotConanfile:
+    """Stand-in for the consumer conanfile, with just what the generator reads"""
+
+    def __init__(self, deps_cpp_info: DepsCppInfo, settings: Settings):
+        self.deps_cpp_info = deps_cpp_info
+        self.deps_env_info = DepsEnvInfo()
+        self.env_info = EnvInfo()
+        self.deps_user_info = DepsUserInfo()
+        self.settings = settings
+
+
+class DependencySnapshot:
+    """Dependencies and settings of a generator run, in the format of the json generator"""
+    # Same keys as the json generator, with the directories as absolute paths
+    directories = {'include_paths': 'includedirs', 'lib_paths': 'libdirs', 'bin_paths': 'bindirs',
+                   'build_paths': 'builddirs', 'res_paths': 'resdirs',
+                   'framework_paths': 'frameworkdirs'}
+    values = ['libs', 'system_libs', 'defines', 'cflags', 'cxxflags', 'sharedlinkflags',
+              'exelinkflags', 'frameworks']
+
+    @staticmethod
+    def _serialize(cpp_info) -> dict:
+        ret = {key: getattr(cpp_info, key) for key in
+               ['version', 'description', 'rootpath', 'sysroot', 'names', 'filenames',
+                'build_modules_paths'] + list(DependencySnapshot.directories)
+               + DependencySnapshot.values}
+        ret['requires'] = list(getattr(cpp_info, 'requires', []))
+        return ret
+
+    @staticmethod
+    def save(deps_build_info, settings, snapshot_file: str):
+        dependencies = []
+        for pkg_name, cpp_info in deps_build_info.dependencies:
+            serialized = DependencySnapshot._serialize(cpp_info)
+            serialized['name'] = pkg_name
+            serialized['public_deps'] = list(cpp_info.public_deps)
+            for config, config_cpp_info in cpp_info.configs.items():
+                serialized.setdefault('configs', {})[config] = DependencySnapshot._serialize(
+                    config_cpp_info)
+            for comp_name, component in cpp_info.components.items():
+                serialized.setdefault('components', {})[comp_name] = DependencySnapshot._serialize(
+                    component)
+            dependencies.append(serialized)
+        folder = os.path.dirname(os.path.abspath(snapshot_file))
+        os.makedirs(folder, exist_ok=True)
+        with open(snapshot_file, 'w', encoding='utf-8') as f:
+            json.dump({'dependencies': dependencies, 'settings': dict(settings.items())}, f,
+                      indent=1)
+
+    @staticmethod
+    def _fill(target, data: dict):
+        """Sets the values of a cpp_info, component or config from its serialized data"""
+        # Paths are kept as they are, they might not exist on this machine
+        target.filter_empty = False
+        for key, attribute in DependencySnapshot.directories.items():
+            if key in data:
+                setattr(target, attribute, list(data[key]))
+        for key in DependencySnapshot.values:
+            if key in data:
+                setattr(target, key, list(data[key]))
+        for key in ('names', 'filenames'):
+            getattr(target, key).update(data.get(key) or {})
+        # Absolute, the json generator has them relative in build_modules too
+        for generator, paths in (data.get('build_modules_paths') or {}).items():
+            target.build_modules[generator] = list(paths)
+        if data.get('description'):
+            target.description = data['description']
+        if data.get('sysroot'):
+            target.sysroot = data['sysroot']
+
+    @staticmethod
+    def load(snapshot_file: str, build_type: str = None) -> SnapshotConanfile:
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        deps_cpp_info = DepsCppInfo()
+        for serialized in data.get('dependencies', []):
+            pkg_name = serialized['name']
+            cpp_info = CppInfo(pkg_name, serialized['rootpath'])
+            cpp_info.version = serialized.get('version')
+            cpp_info.public_deps = list(serialized.get('public_deps', []))
+            components = serialized.get('components') or {}
+            if components:
+                # The package values are aggregated from the components
+                for comp_name, comp_data in components.items():
+                    component = cpp_info.components[comp_name]
+                    DependencySnapshot._fill(component, comp_data)
+                    component.requires = list(comp_data.get('requires', []))
+                cpp_info.filter_empty = False
+                cpp_info.names.update(serialized.get('names') or {})
+                cpp_info.filenames.update(serialized.get('filenames') or {})
+            else:
+                DependencySnapshot._fill(cpp_info, serialized)
+                for config, config_data in (serialized.get('configs') or {}).items():
+                    DependencySnapshot._fill(getattr(cpp_info, config), config_data)
+            deps_cpp_info.add(pkg_name, DepCppInfo(cpp_info))
+        return SnapshotConanfile(deps_cpp_info,
+                                 DependencySnapshot._settings(data.get('settings', {}), build_type))
+
+    @staticmethod
+    def _settings(values: dict, build_type: str = None) -> Settings:
+        from conans.client.conf import get_default_settings_yml
+        settings = Settings.loads(get_default_settings_yml())
+        if build_type:
+            values = dict(values, build_type=build_type)
+        for name, value in values.items():
+            try:
+                settings.update_values([(name, value)])
+            except ConanException as e:
+                print('[DependencySnapshot] Ignoring setting {}: {}'.format(name, e),
+                      file=sys.stderr)
+        return settings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('snapshot', help='JSON file of the json generator or CONAN_CFP_SNAPSHOT')
+    parser.add_argument('--output-folder', default=os.getcwd(),
+                        help='Folder to write the CMake files to')
+    parser.add_argument('--build-type', help='Build type to generate, instead of the one '
+                                             'of the snapshot settings')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Use generate(), which only writes what changed since the last run')
+    args = parser.parse_args(argv)
+
+    from conans.util.files import save
+    from conanfile import CmakeConfigFindPackage
+    conanfile = DependencySnapshot.load(args.snapshot, args.build_type)
+    if conanfile.settings.get_safe('build_type') is None:
+        parser.error('The snapshot has no build_type setting, pass --build-type')
+    generator = CmakeConfigFindPackage(conanfile)
+    generator.output_path = os.path.abspath(args.output_folder)
+    os.makedirs(generator.output_path, exist_ok=True)
+    if args.incremental:
+        generator.generate()
+    else:
+        # The way Conan writes the files of generators
+        for file_name, content in generator.content.items():
+            save(os.path.join(generator.output_path, file_name), content, only_if_modified=True)
+
+
+if __name__ == '__main__':
+    main()
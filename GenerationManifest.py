@@ -0,0 +1,51 @@
+import json
+import os
+
+
+class GenerationManifest:
+    """
+    Record of the files generated for every package and build type, together with a
+    fingerprint of what they were rendered from. Stored next to the generated files.
+    """
+    filename = 'conan_cfp_manifest.json'
+    version = 1
+
+    def __init__(self, output_path: str):
+        self._output_path = output_path
+        # Package name -> build type -> {'fingerprint': str, 'files': [str]}
+        self.packages = {}
+
+    def load(self):
+        try:
+            with open(os.path.join(self._output_path, GenerationManifest.filename), 'r',
+                      encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == GenerationManifest.version:
+                self.packages = data.get('packages', {})
+        except (OSError, ValueError):
+            # No (readable) manifest, everything gets generated
+            self.packages = {}
+
+    def save(self):
+        with open(os.path.join(self._output_path, GenerationManifest.filename), 'w',
+                  encoding='utf-8') as f:
+            json.dump({'version': GenerationManifest.version, 'packages': self.packages}, f,
+                      indent=1, sort_keys=True)
+
+    def is_up_to_date(self, pkg_name: str, build_type: str, fingerprint: str) -> bool:
+        entry = self.packages.get(pkg_name, {}).get(build_type)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return False
+        return all(os.path.exists(os.path.join(self._output_path, f)) for f in entry['files'])
+
+    def update(self, pkg_name: str, build_type: str, fingerprint: str, files):
+        self.packages.setdefault(pkg_name, {})[build_type] = {
+            'fingerprint': fingerprint, 'files': sorted(files)}
+
+    def remove_package(self, pkg_name: str):
+        self.packages.pop(pkg_name, None)
+
+    def files(self) -> set:
+        """All files generated for any package and build type"""
+        return {f for build_types in self.packages.values()
+                for entry in build_types.values() for f in entry['files']}
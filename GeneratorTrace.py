@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class GeneratorTrace:
+    """
+    Nested timing spans and counters of a generator run, written in the Chrome trace
+    event format (chrome://tracing, https://ui.perfetto.dev). A disabled trace records
+    nothing, spans then cost a function call.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._start = time.perf_counter_ns()
+        self._events = []
+        self._counters = {}
+        # Spans are recorded from the deduction threads too
+        self._lock = threading.Lock()
+
+    def _now(self) -> int:
+        """Microseconds since the trace started"""
+        return (time.perf_counter_ns() - self._start) // 1000
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Times the enclosed block, args are shown with the span. Yields the args to add more."""
+        if not self.enabled:
+            yield args
+            return
+        start = self._now()
+        try:
+            yield args
+        finally:
+            event = dict(name=name, ph='X', ts=start, dur=self._now() - start,
+                         pid=os.getpid(), tid=threading.get_ident(), args=args)
+            with self._lock:
+                self._events.append(event)
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        """Count and total duration in microseconds of the spans, per span name"""
+        ret = {}
+        with self._lock:
+            for event in self._events:
+                entry = ret.setdefault(event['name'], {'count': 0, 'total_us': 0})
+                entry['count'] += 1
+                entry['total_us'] += event['dur']
+        return ret
+
+    def save(self, trace_file: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self._counters)
+        events.append(dict(name='counters', ph='C', ts=self._now(), pid=os.getpid(),
+                           tid=threading.get_ident(), args=counters))
+        folder = os.path.dirname(os.path.abspath(trace_file))
+        os.makedirs(folder, exist_ok=True)
+        with open(trace_file, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'counters': counters, 'summary': self.summary()}}, f)
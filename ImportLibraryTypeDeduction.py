@@ -1,23 +1,37 @@
+import os
+import re
 import subprocess
 from pathlib import Path
-from contextlib import contextmanager
-import glob
 
 from conans import ConanFile
 from conans.client.tools.oss import OSInfo
-from conans.client.tools.win import vcvars_dict, environment_append
 
-@contextmanager
-def run_with_env(env_dict):
-    with environment_append(env_dict):
-        yield
+from CoffArchiveReader import CoffArchiveReader, CoffArchiveError
+from DeductionCache import DeductionCache
+from GeneratorTrace import GeneratorTrace
+from LibraryDirectoryIndex import LibraryDirectoryIndex
+from LibraryFileReader import LibraryFileError, LibraryFileReader
+from VcvarsEnvironment import VcvarsEnvironment
 
 class ImportLibraryTypeDeduction:
-    def __init__(self,conanfile: ConanFile):
-        if OSInfo().is_windows:
-            self._vcvars_env = vcvars_dict(conanfile)
-        else:
-            self._vcvars_env = None
+    # Shared library names, for files whose content tells nothing
+    shared_library_name = re.compile(r'\.(so(\.[0-9][0-9.]*)?|dylib|tbd)$')
+
+    def __init__(self,conanfile: ConanFile, cache: DeductionCache = None, lib_reader: str = 'coff',
+                 vcvars_cache_file: str = None, trace: GeneratorTrace = None):
+        # Only computed when lib actually has to run
+        self._vcvars = VcvarsEnvironment(conanfile, vcvars_cache_file)
+        self._cache = cache
+        self._trace = trace or GeneratorTrace(enabled=False)
+        # One directory listing per libdir per run, shared by packages and components
+        os_info = OSInfo()
+        self._library_index = LibraryDirectoryIndex(os_info.is_windows, os_info.is_macos)
+        # Either 'coff' to read archives in Python, or 'lib' to run lib /LIST
+        if lib_reader not in ('coff', 'lib'):
+            raise Exception("[ImportLibraryTypeDeduction] Unknown library reader {}".format(lib_reader))
+        self._lib_reader = lib_reader
+        # Linux and macOS deductions per (path, mtime), libraries are often shared by build types
+        self._library_infos = {}
     
     @staticmethod
     def get_dll_location(dll_to_find:str, cpp_info)-> str:
@@ -32,23 +46,43 @@ class ImportLibraryTypeDeduction:
             ','.join([str(Path(cpp_info.rootpath)/b) for b in cpp_info.bindirs])))
         return dll_location
 
-    def deduce_windows_import_type(self, lib_path, cpp_info):
-        # Enable vc
+    def _list_with_lib(self, lib_path):
+        """Returns the first member listed by lib /LIST and the full output of lib"""
         first_line = ''
         output_dump = ''
-        with run_with_env(self._vcvars_env):
-            process = subprocess.run(
-                ['lib', '/LIST', '/NOLOGO', lib_path], capture_output=True, encoding='utf-8')
-            output_dump = process.stdout
-            for line in output_dump.split('\n'):
-                first_line = line.strip()
-                if len(first_line) > 0:
-                    break
-        if first_line.strip().endswith('.obj'):
+        # Enable vc, without touching os.environ as deductions run concurrently
+        with self._trace.span('vcvars'):
+            environment = self._vcvars.environment
+            lib = self._vcvars.which('lib')
+        with self._trace.span('lib /LIST', library=lib_path):
+            process = subprocess.run([lib, '/LIST', '/NOLOGO', lib_path], capture_output=True,
+                                     encoding='utf-8', env=environment)
+        self._trace.count('lib_list_runs')
+        output_dump = process.stdout
+        for line in output_dump.split('\n'):
+            first_line = line.strip()
+            if len(first_line) > 0:
+                break
+        return first_line, output_dump
+
+    def deduce_windows_import_type(self, lib_path, cpp_info):
+        dll_name = None
+        if self._lib_reader == 'coff':
+            try:
+                with self._trace.span('read coff archive', library=lib_path):
+                    first_line, dll_name = CoffArchiveReader(lib_path).read_import_info()
+                output_dump = 'Read by CoffArchiveReader, first member: {}'.format(first_line)
+            except (CoffArchiveError, OSError) as e:
+                self._trace.count('coff_reader_fallbacks')
+                print('[ImportLibraryTypeDeduction] Falling back to lib /LIST: {}'.format(e))
+                first_line, output_dump = self._list_with_lib(lib_path)
+        else:
+            first_line, output_dump = self._list_with_lib(lib_path)
+        if dll_name is None and first_line.strip().endswith('.obj'):
             return {'import_type':'STATIC', 'has_importlib':False}
         else:
-            # Heuristcally find the dll corresponding to importlib.
-            dll_to_find = first_line.strip()
+            # Short import objects name the dll, otherwise heuristically find the dll corresponding to importlib.
+            dll_to_find = dll_name or first_line.strip()
             try:
                 dll_location = ImportLibraryTypeDeduction.get_dll_location(dll_to_find, cpp_info)
             except Exception as e:
@@ -61,31 +95,84 @@ class ImportLibraryTypeDeduction:
             return {'import_type':'SHARED', 'has_importlib':True, 
                 'importlib':lib_path,'dll_location':dll_location}
 
-    def deduce_linux_import_type(self, lib_path, cpp_info):
-        if lib_path.endswith('dynlib') or lib_path.endswith('so'):
+    def _read_library_file(self, lib_path):
+        try:
+            with self._trace.span('read library file', library=lib_path):
+                library = LibraryFileReader(lib_path).read()
+        except (LibraryFileError, OSError) as e:
+            self._trace.count('library_reader_fallbacks')
+            print('[ImportLibraryTypeDeduction] Deducing from the file name: {}'.format(e))
+            library = {'kind': 'unknown'}
+        if library['kind'] == 'shared':
+            import_lib_info = {'import_type':'SHARED', 'has_importlib':False}
+            if library['soname']:
+                import_lib_info['soname'] = library['soname']
+            return import_lib_info
+        if library['kind'] == 'static':
+            return {'import_type':'STATIC', 'has_importlib':False}
+        if library['kind'] == 'linker_script':
+            # E.g. libc.so, only the linker knows what it stands for
+            return {'import_type':'UNKNOWN', 'has_importlib':False}
+        if ImportLibraryTypeDeduction.shared_library_name.search(lib_path):
             return {'import_type':'SHARED', 'has_importlib':False}
         return {'import_type':'STATIC', 'has_importlib':False}
 
+    def deduce_linux_import_type(self, lib_path, cpp_info):
+        key = (lib_path, os.stat(lib_path).st_mtime_ns)
+        import_lib_info = self._library_infos.get(key)
+        if import_lib_info is None:
+            import_lib_info = self._library_infos.setdefault(key, self._read_library_file(lib_path))
+        return dict(import_lib_info)
+
     def _deduce_import_type(self, lib_path, cpp_info):
+        if self._cache is not None:
+            import_lib_info = self._cache.get(lib_path)
+            if import_lib_info is not None:
+                self._trace.count('deduction_cache_hits')
+                return import_lib_info
+            self._trace.count('deduction_cache_misses')
         os_info = OSInfo()
         if os_info.is_windows:
-            return self.deduce_windows_import_type(lib_path, cpp_info)
+            import_lib_info = self.deduce_windows_import_type(lib_path, cpp_info)
         else:
-            return self.deduce_linux_import_type(lib_path, cpp_info)
+            import_lib_info = self.deduce_linux_import_type(lib_path, cpp_info)
+        if self._cache is not None:
+            self._cache.put(lib_path, import_lib_info)
+        return import_lib_info
+
+    def save_cache(self):
+        if self._cache is not None:
+            self._cache.save()
+
+    def find_libraries(self, cpp_info):
+        """
+        Paths of the library files of cpp_info, and the resolved path per library, in the
+        order of cpp_info.libs
+        """
+        lib_files = []
+        library_paths = {}
+        libdirs = [str(Path(cpp_info.rootpath) / libdir) for libdir in cpp_info.libdirs]
+        for lib in cpp_info.libs:
+            lib_files.extend(self._library_index.find(lib, libdirs))
+            # The file find_library would pick, so resolving it does not change what is linked
+            library_path = self._library_index.find_library(lib, libdirs)
+            if library_path is not None:
+                library_paths[lib] = library_path
+        return lib_files, library_paths
 
     def import_library_info_from_cppinfo(self, cpp_info):
+        """
+        Import type of the libraries of cpp_info, with the resolved path of every library
+        that was found in library_paths, in the order of cpp_info.libs.
+        """
         if len(cpp_info.libs) > 0:
-            lib_files = []
-            # Collect library files
-            for lib in cpp_info.libs:
-                for libdir in cpp_info.libdirs:
-                    result = glob.glob(
-                        str(Path(cpp_info.rootpath) / libdir/'{}.*'.format(lib)))
-                    lib_files.extend(result)
+            lib_files, library_paths = self.find_libraries(cpp_info)
             if len(lib_files) == 1:
-                return self._deduce_import_type(lib_files[0], cpp_info)
+                import_lib_info = self._deduce_import_type(lib_files[0], cpp_info)
             else:
                 # For now, we assume that multiple libs must be an interface target
-                return {'import_type':'INTERFACE', 'has_importlib':False}
+                import_lib_info = {'import_type':'INTERFACE', 'has_importlib':False}
+            import_lib_info['library_paths'] = library_paths
+            return import_lib_info
         # Default to INTERFACe if no library can be found
-        return {'import_type':'INTERFACE', 'has_importlib':False}
+        return {'import_type':'INTERFACE', 'has_importlib':False, 'library_paths': {}}
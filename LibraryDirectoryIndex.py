@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+
+
+class LibraryDirectoryIndex:
+    """
+    Index of the files in library directories, built with a single os.scandir per
+    directory and shared by every lookup of a run. Library names are matched with the
+    naming rules of the platform, similar to CMake's find_library.
+    """
+    # Kinds of library files per platform, most preferred first. MSVC links .lib files,
+    # find_library only looks for MinGW import libraries and archives after them.
+    windows_kinds = ('lib', 'import', 'static', 'file')
+    kinds = ('shared', 'static', 'file')
+    # CMAKE_FIND_LIBRARY_PREFIXES and CMAKE_FIND_LIBRARY_SUFFIXES of MSVC, macOS and Linux
+    windows_find_library = (('',), ('.lib',))
+    macos_find_library = (('lib',), ('.tbd', '.dylib', '.so', '.a'))
+    find_library_affixes = (('lib',), ('.so', '.a'))
+
+    def __init__(self, is_windows: bool, is_macos: bool):
+        self._is_windows = is_windows
+        self._is_macos = is_macos
+        self._kinds = LibraryDirectoryIndex.windows_kinds if is_windows else LibraryDirectoryIndex.kinds
+        if is_windows:
+            self._find_library_affixes = LibraryDirectoryIndex.windows_find_library
+        elif is_macos:
+            self._find_library_affixes = LibraryDirectoryIndex.macos_find_library
+        else:
+            self._find_library_affixes = LibraryDirectoryIndex.find_library_affixes
+        # Directory -> base name (up to the first dot) -> file names
+        self._directories = {}
+        self._lock = threading.Lock()
+
+    def _base_name(self, name: str) -> str:
+        base = name.split('.', 1)[0]
+        return base.lower() if self._is_windows else base
+
+    def _index(self, libdir: str) -> dict:
+        index = self._directories.get(libdir)
+        if index is None:
+            index = {}
+            try:
+                with os.scandir(libdir) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            index.setdefault(self._base_name(entry.name), []).append(entry.name)
+            except OSError:
+                # Missing library directories are common, e.g. the default 'lib'
+                pass
+            with self._lock:
+                index = self._directories.setdefault(libdir, index)
+        return index
+
+    def _patterns(self, lib: str):
+        """Regular expressions for the file names of lib, with the kind of library they match"""
+        name = re.escape(lib)
+        version = r'(\.[0-9][0-9.]*)?'
+        if self._is_windows:
+            patterns = [('lib', r'{}\.lib'.format(name)),
+                        ('static', r'(lib)?{}\.a'.format(name)),
+                        ('import', r'(lib)?{}\.dll\.a'.format(name))]
+        elif self._is_macos:
+            patterns = [('shared', r'(lib)?{}{}\.(dylib|tbd)'.format(name, version)),
+                        ('shared', r'(lib)?{}\.so{}'.format(name, version)),
+                        ('static', r'(lib)?{}\.a'.format(name))]
+        else:
+            patterns = [('shared', r'(lib)?{}\.so{}'.format(name, version)),
+                        ('static', r'(lib)?{}\.a'.format(name))]
+        if '.' in lib:
+            # Libraries can also be given by their file name
+            patterns.append(('file', name))
+        flags = re.IGNORECASE if self._is_windows else 0
+        return [(kind, re.compile(pattern + '$', flags)) for kind, pattern in patterns]
+
+    def find(self, lib: str, libdirs) -> list:
+        """
+        Paths of the library files of lib in libdirs. Versioned names of the same
+        library (libfoo.so, libfoo.so.1, libfoo.so.1.2) count as one file, the least
+        versioned one is returned. The files of a directory are ordered by the preference
+        of their kind.
+        """
+        patterns = self._patterns(lib)
+        base = self._base_name(lib)
+        found = []
+        for libdir in libdirs:
+            index = self._index(libdir)
+            names = index.get(base, []) + index.get(self._base_name('lib' + lib), [])
+            per_kind = {}
+            for file_name in names:
+                kind = next((k for k, pattern in patterns if pattern.match(file_name)), None)
+                if kind is not None:
+                    per_kind.setdefault(kind, []).append(file_name)
+            for kind in self._kinds:
+                if kind not in per_kind:
+                    continue
+                file_name = min(per_kind[kind], key=lambda n: (len(n), n))
+                found.append(os.path.join(libdir, file_name))
+        return found
+
+    def _find_library_names(self, lib: str) -> list:
+        """File names find_library tries for lib, in its order"""
+        prefixes, suffixes = self._find_library_affixes
+        names = []
+        # A name with a library suffix, or a versioned one, is first tried as it is
+        if any(lib.endswith(suffix) or suffix + '.' in lib for suffix in suffixes):
+            names.append(lib)
+        names.extend(prefix + lib + suffix for prefix in prefixes for suffix in suffixes)
+        return names
+
+    def find_library(self, lib: str, libdirs) -> str:
+        """
+        Path of the file CMake's find_library finds for lib in libdirs, or None. Unlike
+        find, versioned names like libfoo.so.1 are not found for foo.
+        """
+        # File names are case insensitive on Windows
+        fold = str.lower if self._is_windows else str
+        names = [fold(name) for name in self._find_library_names(lib)]
+        for libdir in libdirs:
+            index = self._index(libdir)
+            files = {fold(file_name): file_name for file_name in
+                     index.get(self._base_name(lib), []) + index.get(self._base_name('lib' + lib), [])}
+            for name in names:
+                if name in files:
+                    return os.path.join(libdir, files[name])
+        return None
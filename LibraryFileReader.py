@@ -0,0 +1,173 @@
+import mmap
+import re
+import struct
+
+
+class LibraryFileError(Exception):
+    pass
+
+
+class LibraryFileReader:
+    """
+    Tells the kind of a library file on Linux and macOS from its content: ELF shared
+    objects, ar archives, Mach-O dylibs (also in universal binaries), text stubs and GNU
+    ld scripts. The file is mapped, only the pages of the headers, the load commands and
+    the dynamic section are read. See https://refspecs.linuxfoundation.org/elf/gabi4+/contents.html
+    and https://github.com/apple-oss-distributions/xnu/blob/main/EXTERNAL_HEADERS/mach-o/loader.h
+    """
+    archive_signatures = (b'!<arch>\n', b'!<thin>\n')
+    elf_signature = b'\x7fELF'
+    # e_type and e_phoff, e_phentsize and e_phnum, after e_ident, per ELF class
+    elf_headers = {1: ('HHIIII', 'IHHHHHH'), 2: ('HHIQQQ', 'IHHHHHH')}
+    # Program header layout per ELF class
+    elf_segments = {1: 'IIIIIIII', 2: 'IIQQQQQQ'}
+    elf_dynamic = {1: 'iI', 2: 'qQ'}
+    ET_DYN = 3
+    PT_LOAD, PT_DYNAMIC = 1, 2
+    DT_NULL, DT_STRTAB, DT_SONAME = 0, 5, 14
+    # Magic as read in little endian: byte order prefix and whether the header is 64 bit
+    macho_magics = {0xfeedface: ('<', False), 0xfeedfacf: ('<', True),
+                    0xcefaedfe: ('>', False), 0xcffaedfe: ('>', True)}
+    macho_fat_magic = b'\xca\xfe\xba\xbe'
+    MH_DYLIB, MH_DYLIB_STUB = 6, 9
+    LC_ID_DYLIB = 0xd
+    tbd_install_name = re.compile(rb'^install-name:\s*[\'"]?([^\'"\r\n]+)', re.MULTILINE)
+    ld_script_commands = re.compile(rb'\b(GROUP|INPUT|OUTPUT_FORMAT|AS_NEEDED)\s*\(')
+    # Bytes looked at to recognize text files
+    text_header_size = 4096
+
+    def __init__(self, lib_path: str):
+        self._lib_path = lib_path
+
+    def _unpack(self, fmt: str, data, offset: int) -> tuple:
+        try:
+            return struct.unpack_from(fmt, data, offset)
+        except struct.error:
+            raise LibraryFileError('{} is truncated at offset {}'.format(self._lib_path, offset))
+
+    @staticmethod
+    def _string(data, offset: int, end: int = None) -> str:
+        end = data.find(b'\0', offset, len(data) if end is None else end)
+        if end < 0:
+            return None
+        return data[offset:end].decode('utf-8', errors='replace') or None
+
+    def _elf_soname(self, data, elf_class: int, order: str, phoff: int, phentsize: int,
+                    phnum: int):
+        """DT_SONAME of the dynamic segment, None without program headers or soname"""
+        loads = []
+        dynamic = None
+        for index in range(phnum):
+            fields = self._unpack(order + LibraryFileReader.elf_segments[elf_class], data,
+                                  phoff + index * phentsize)
+            if elf_class == 1:
+                p_type, p_offset, p_vaddr, _, p_filesz = fields[:5]
+            else:
+                p_type, _, p_offset, p_vaddr, _, p_filesz = fields[:6]
+            if p_type == LibraryFileReader.PT_LOAD:
+                loads.append((p_vaddr, p_offset, p_filesz))
+            elif p_type == LibraryFileReader.PT_DYNAMIC:
+                dynamic = (p_offset, p_filesz)
+        if dynamic is None:
+            return None
+        entry = order + LibraryFileReader.elf_dynamic[elf_class]
+        entry_size = struct.calcsize(entry)
+        strtab = soname = None
+        for offset in range(dynamic[0], dynamic[0] + dynamic[1] - entry_size + 1, entry_size):
+            tag, value = self._unpack(entry, data, offset)
+            if tag == LibraryFileReader.DT_NULL:
+                break
+            if tag == LibraryFileReader.DT_STRTAB:
+                strtab = value
+            elif tag == LibraryFileReader.DT_SONAME:
+                soname = value
+        if strtab is None or soname is None:
+            return None
+        # DT_STRTAB is an address, the segment loading it tells where it is in the file
+        for p_vaddr, p_offset, p_filesz in loads:
+            if p_vaddr <= strtab < p_vaddr + p_filesz:
+                return LibraryFileReader._string(data, strtab - p_vaddr + p_offset + soname)
+        return None
+
+    def _read_elf(self, data) -> dict:
+        elf_class, encoding = self._unpack('BB', data, 4)
+        if elf_class not in LibraryFileReader.elf_headers or encoding not in (1, 2):
+            raise LibraryFileError('{} has an unknown ELF class or encoding'.format(self._lib_path))
+        order = '<' if encoding == 1 else '>'
+        head, tail = LibraryFileReader.elf_headers[elf_class]
+        e_type, _, _, _, e_phoff, _ = self._unpack(order + head, data, 16)
+        _, _, e_phentsize, e_phnum, _, _, _ = self._unpack(
+            order + tail, data, 16 + struct.calcsize(order + head))
+        if e_type != LibraryFileReader.ET_DYN:
+            # Objects and executables, not something to link to
+            return {'kind': 'unknown'}
+        return {'kind': 'shared', 'soname': self._elf_soname(
+            data, elf_class, order, e_phoff, e_phentsize, e_phnum) if e_phoff else None}
+
+    @staticmethod
+    def _is_macho(data, offset: int = 0) -> bool:
+        magic = data[offset:offset + 4]
+        return len(magic) == 4 and struct.unpack('<I', magic)[0] in LibraryFileReader.macho_magics
+
+    def _read_macho(self, data, offset: int = 0) -> dict:
+        magic, = self._unpack('<I', data, offset)
+        order, is_64 = LibraryFileReader.macho_magics[magic]
+        _, _, filetype, ncmds, _, _ = self._unpack(order + 'iiIIII', data, offset + 4)
+        if filetype not in (LibraryFileReader.MH_DYLIB, LibraryFileReader.MH_DYLIB_STUB):
+            return {'kind': 'unknown'}
+        command = offset + (32 if is_64 else 28)
+        for _ in range(ncmds):
+            cmd, cmdsize = self._unpack(order + 'II', data, command)
+            if cmd == LibraryFileReader.LC_ID_DYLIB:
+                name_offset, = self._unpack(order + 'I', data, command + 8)
+                return {'kind': 'shared', 'soname': LibraryFileReader._string(
+                    data, command + name_offset, command + cmdsize)}
+            if cmdsize == 0:
+                raise LibraryFileError('Corrupt load command in {}'.format(self._lib_path))
+            command += cmdsize
+        return {'kind': 'shared', 'soname': None}
+
+    def _read_macho_fat(self, data) -> dict:
+        nfat_arch, = self._unpack('>I', data, 4)
+        # Java class files share the magic, with their version where the count is
+        if nfat_arch == 0 or nfat_arch > 32:
+            return {'kind': 'unknown'}
+        # All architectures of a universal binary are the same library, read the first
+        _, _, offset, _, _ = self._unpack('>iiIII', data, 8)
+        if not LibraryFileReader._is_macho(data, offset):
+            raise LibraryFileError('{} has no Mach-O file at offset {}'.format(self._lib_path, offset))
+        return self._read_macho(data, offset)
+
+    def _read_text(self, data) -> dict:
+        header = data[:LibraryFileReader.text_header_size]
+        if b'\0' in header:
+            return {'kind': 'unknown'}
+        if header.startswith(b'--- !tapi-tbd') or header.startswith(b'---\narchs:'):
+            install_name = LibraryFileReader.tbd_install_name.search(header)
+            return {'kind': 'shared',
+                    'soname': install_name.group(1).decode('utf-8') if install_name else None}
+        if LibraryFileReader.ld_script_commands.search(header):
+            return {'kind': 'linker_script'}
+        return {'kind': 'unknown'}
+
+    def read(self) -> dict:
+        """
+        Kind of the library, one of shared, static, linker_script or unknown. Shared
+        libraries have their soname, the ELF DT_SONAME or Mach-O install name, or None.
+        """
+        with open(self._lib_path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise LibraryFileError('{} is empty'.format(self._lib_path))
+            with data:
+                magic = data[:8]
+                if magic in LibraryFileReader.archive_signatures:
+                    return {'kind': 'static'}
+                if magic[:4] == LibraryFileReader.elf_signature:
+                    return self._read_elf(data)
+                if LibraryFileReader._is_macho(data):
+                    return self._read_macho(data)
+                if magic[:4] == LibraryFileReader.macho_fat_magic:
+                    return self._read_macho_fat(data)
+                return self._read_text(data)
@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+class RenderCache:
+    """
+    Rendered files of packages shared between projects, stored in the Conan user home.
+    An entry is a folder named after its key with the files of one package and an
+    entry.json listing them. Entries are written once and never modified, the mtime of
+    entry.json records when they were last used.
+    """
+    entry_filename = 'entry.json'
+    # Bump when the layout of the entries changes
+    version = 1
+
+    def __init__(self, cache_folder: str, max_size: int, link: bool = True, trace=None):
+        self._cache_folder = cache_folder
+        self._max_size = max_size
+        self._link = link
+        self._trace = trace
+        self._stored = False
+        # Entries of this run, installed after the eviction
+        self._used = set()
+
+    def _count(self, name: str, value: int = 1):
+        if self._trace is not None:
+            self._trace.count(name, value)
+
+    def _entry_folder(self, key: str) -> str:
+        return os.path.join(self._cache_folder, key)
+
+    def get(self, key: str):
+        """Paths of the cached files per file name, None when the entry is missing or modified"""
+        entry_folder = self._entry_folder(key)
+        entry_file = os.path.join(entry_folder, RenderCache.entry_filename)
+        try:
+            with open(entry_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get('version') != RenderCache.version:
+                raise ValueError(entry_file)
+            ret = {}
+            for file_name, (size, mtime) in entry['files'].items():
+                cached_file = os.path.join(entry_folder, file_name)
+                stat = os.stat(cached_file)
+                # Written through a hardlink by someone else, the entry cannot be trusted
+                if stat.st_size != size or stat.st_mtime_ns != mtime:
+                    raise ValueError(cached_file)
+                ret[file_name] = cached_file
+            os.utime(entry_file)
+            self._used.add(key)
+        except (OSError, ValueError, KeyError, TypeError):
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            self._count('render_cache_misses')
+            return None
+        self._count('render_cache_hits')
+        return ret
+
+    def put(self, key: str, files: dict):
+        """Stores the rendered files of a package, file name -> content"""
+        os.makedirs(self._cache_folder, exist_ok=True)
+        # Filled aside and renamed, concurrent runs might store the same entry
+        tmp_folder = tempfile.mkdtemp(dir=self._cache_folder, suffix='.tmp')
+        try:
+            entry = {'version': RenderCache.version, 'files': {}}
+            for file_name, content in files.items():
+                cached_file = os.path.join(tmp_folder, file_name)
+                with open(cached_file, 'wb') as f:
+                    f.write(content.encode('utf-8'))
+                stat = os.stat(cached_file)
+                entry['files'][file_name] = [stat.st_size, stat.st_mtime_ns]
+            with open(os.path.join(tmp_folder, RenderCache.entry_filename), 'w',
+                      encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.rename(tmp_folder, self._entry_folder(key))
+            self._used.add(key)
+            self._stored = True
+        except OSError:
+            # Stored by another run in the meantime
+            pass
+        finally:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+
+    def install(self, cached_file: str, target_file: str):
+        """
+        Puts a cached file at target_file. New files are hardlinked, existing files are
+        replaced by a copy when their content differs, so their mtime tells CMake to
+        configure again.
+        """
+        if os.path.exists(target_file):
+            with open(cached_file, 'rb') as f:
+                content = f.read()
+            with open(target_file, 'rb') as f:
+                if f.read() == content:
+                    return
+            os.remove(target_file)
+        else:
+            os.makedirs(os.path.dirname(target_file), exist_ok=True)
+            if self._link:
+                try:
+                    os.link(cached_file, target_file)
+                    self._count('files_linked')
+                    return
+                except OSError:
+                    # Other file system, or one without hardlinks
+                    pass
+        shutil.copyfile(cached_file, target_file)
+        self._count('files_copied')
+
+    @staticmethod
+    def _entry_size(entry_folder: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(entry_folder) if entry.is_file())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits its maximum size. The
+        entries of this run are kept, even when they alone exceed it.
+        """
+        if not self._stored:
+            return
+        entries = []
+        total = 0
+        for entry in os.scandir(self._cache_folder):
+            if not entry.is_dir():
+                continue
+            try:
+                last_used = os.stat(os.path.join(entry.path, RenderCache.entry_filename)).st_mtime
+                size = self._entry_size(entry.path)
+            except OSError:
+                # Being stored or removed by another run, or older than a day and abandoned
+                if entry.name.endswith('.tmp') and entry.stat().st_mtime < time.time() - 86400:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            total += size
+            if entry.name not in self._used:
+                entries.append((last_used, size, entry.path))
+        for _, size, entry_folder in sorted(entries):
+            if total <= self._max_size:
+                break
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            total -= size
+            self._count('render_cache_evictions')
+        self._stored = False
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from conans import ConanFile
+
+
+class VcvarsEnvironment:
+    """
+    Environment to run the MSVC tools in, computed from vcvarsall.bat on first use.
+    Running vcvarsall.bat takes seconds, so the result is memoized per process for
+    every compiler version, arch and toolset, and optionally persisted to disk.
+    """
+    _memo = {}
+    _lock = threading.Lock()
+
+    def __init__(self, conanfile: ConanFile, cache_file: str = None):
+        self._conanfile = conanfile
+        self._cache_file = cache_file
+        self._environment = None
+        self._executables = {}
+
+    def _key(self):
+        settings = self._conanfile.settings
+        return tuple(str(settings.get_safe(setting)) for setting in
+                     ('compiler.version', 'arch', 'compiler.toolset'))
+
+    def _invalidation_key(self, key):
+        # vcvars only reports what differs from the current environment, and
+        # depends on the Visual Studio installation it was computed for
+        from conans.client.tools.win import vs_installation_path
+        try:
+            installation = vs_installation_path(key[0])
+        except Exception:
+            installation = None
+        return json.dumps([list(key), installation, os.environ.get('PATH', '')])
+
+    def _load_persisted(self, invalidation_key):
+        try:
+            with open(self._cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get(invalidation_key)
+        except (OSError, ValueError):
+            return None
+
+    def _persist(self, invalidation_key, vcvars_env):
+        try:
+            with open(self._cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[invalidation_key] = vcvars_env
+        folder = os.path.dirname(self._cache_file)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self._cache_file)
+
+    def _vcvars(self):
+        from conans.client.tools.win import vcvars_dict
+        key = self._key()
+        with VcvarsEnvironment._lock:
+            if key not in VcvarsEnvironment._memo:
+                vcvars_env = None
+                if self._cache_file:
+                    invalidation_key = self._invalidation_key(key)
+                    vcvars_env = self._load_persisted(invalidation_key)
+                if vcvars_env is None:
+                    vcvars_env = vcvars_dict(self._conanfile)
+                    if self._cache_file:
+                        self._persist(invalidation_key, vcvars_env)
+                VcvarsEnvironment._memo[key] = vcvars_env
+            return VcvarsEnvironment._memo[key]
+
+    @property
+    def environment(self) -> dict:
+        """The current environment with the vcvars applied, like environment_append does"""
+        if self._environment is None:
+            environment = dict(os.environ)
+            for name, value in self._vcvars().items():
+                # Windows variable names are case insensitive
+                name = next((k for k in environment if k.lower() == name.lower()), name)
+                if isinstance(value, list):
+                    value = os.pathsep.join(
+                        value + ([environment[name]] if environment.get(name) else []))
+                environment[name] = value
+            self._environment = environment
+        return self._environment
+
+    def which(self, executable: str) -> str:
+        """
+        Absolute path of an executable in the vcvars PATH. Windows resolves executables
+        with the PATH of the parent process, not of the environment passed to the child.
+        """
+        if executable not in self._executables:
+            path = next((v for k, v in self.environment.items() if k.lower() == 'path'), None)
+            self._executables[executable] = shutil.which(executable, path=path) or executable
+        return self._executables[executable]
@@ -0,0 +1,134 @@
+"""
+Compares the expansion of component_vars for a Boost-sized package, with the filters
+resolved once per run against looking them up by name for every expansion, e.g.
+
+    python benchmarks/bench_filters.py --components 140 --build-types 4 --repeat 5
+
+Both pipelines must produce the same text, the script exits with 1 otherwise.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import synthetic_graph  # noqa: F401, puts the repository on sys.path
+from conanfile import CmakeConfigFindPackage, CmakeFilters
+
+
+class LegacyFilters:
+    """The filter pipeline before it was precompiled: lookup by name, nothing memoized"""
+
+    @staticmethod
+    def cmake_apply_filter(paths, filter_obj):
+        if not 'filter' in filter_obj or filter_obj['filter'] == 'None':
+            return paths
+        if hasattr(LegacyFilters, filter_obj['filter']):
+            if 'filterargs' in filter_obj:
+                return getattr(LegacyFilters, filter_obj['filter']).__call__(paths, *filter_obj['filterargs'])
+            return getattr(LegacyFilters, filter_obj['filter']).__call__(paths)
+        raise Exception("Unknown filter {}".format(filter_obj['filter']))
+
+    @staticmethod
+    def cmake_pathsjoin(paths):
+        return "\n\t\t\t".join('"%s"' % p.replace('\\', '/').replace('$', '\\$').replace('"', '\\"')
+                               for p in paths)
+
+    @staticmethod
+    def cmake_flagsjoin(values, separator=' '):
+        return separator.join(v.replace('\\', '\\\\').replace('$', '\\$').replace('"', '\\"')
+                              for v in values)
+
+    @staticmethod
+    def cmake_definesjoin(values, prefix=""):
+        return "\n\t\t\t".join('"%s%s"' % (prefix, v.replace('\\', '\\\\').replace('$', '\\$').
+                                           replace('"', '\\"'))
+                               for v in values)
+
+    @staticmethod
+    def cmake_pathsjoinsingle(values):
+        return '"%s"' % ";".join(p.replace('\\', '/').replace('$', '\\$') for p in values)
+
+
+def boost_like_components(count: int, build_types: int) -> list:
+    """
+    Values of the components per build type, like Boost: every component shares the
+    include and library directories of the package, with a few defines and flags each.
+    """
+    root = 'C:\\.conan\\data\\boost\\1.81.0\\_\\_\\package\\$hash' if sys.platform == 'win32' \
+        else '/home/user/.conan/data/boost/1.81.0/_/_/package/$hash'
+    shared = dict(include_paths=[os.path.join(root, 'include')],
+                  lib_paths=[os.path.join(root, 'lib')],
+                  res_paths=[], framework_paths=[], frameworks=[],
+                  build_module_paths=[os.path.join(root, 'lib', 'cmake', 'conan-official-boost-variables.cmake')])
+    components = []
+    for build_type in range(build_types):
+        for index in range(count):
+            name = 'boost_component{}'.format(index)
+            values = dict(shared,
+                          defines=['BOOST_ALL_NO_LIB', 'BOOST_{}_DYN_LINK'.format(name.upper()),
+                                   'BOOST_CONFIG="quoted value"'],
+                          cflags=[], cxxflags=['-fvisibility=hidden', '-DPATH="$ORIGIN"'],
+                          libs=['{}-mt{}'.format(name, '-d' if build_type else '')],
+                          system_libs=['pthread', 'rt'] if index % 3 == 0 else [],
+                          public_deps=['boost::headers'])
+            components.append(values)
+    return components
+
+
+def expand_legacy(components, component_vars) -> list:
+    return ['set({} {})'.format(cmake_name, LegacyFilters.cmake_apply_filter(values[mapping['key']], mapping))
+            for values in components for cmake_name, mapping in component_vars.items()]
+
+
+def expand_compiled(components, component_filters) -> list:
+    return ['set({} {})'.format(cmake_name, apply_filter(values[key]))
+            for values in components for cmake_name, key, apply_filter in component_filters]
+
+
+def measure(function, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--components', type=int, default=140, help='Components of the package')
+    parser.add_argument('--build-types', type=int, default=4, help='Build types rendered')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per pipeline, the median is kept')
+    args = parser.parse_args(argv)
+
+    components = boost_like_components(args.components, args.build_types)
+    component_vars = CmakeConfigFindPackage.component_vars
+    # Resolved once per generator run
+    component_filters = [(cmake_name, mapping['key'], CmakeFilters.compile_filter(mapping))
+                         for cmake_name, mapping in component_vars.items()]
+    if expand_legacy(components, component_vars) != expand_compiled(components, component_filters):
+        print('The pipelines produce different text', file=sys.stderr)
+        return 1
+
+    legacy = measure(lambda: expand_legacy(components, component_vars), args.repeat)
+    # Cold: the joins memoized by the previous runs are forgotten
+    joins = [CmakeFilters._pathsjoin, CmakeFilters._pathsjoinsingle, CmakeFilters._flagsjoin,
+             CmakeFilters._definesjoin]
+    for join in joins:
+        join.cache_clear()
+    compiled_cold = measure(lambda: expand_compiled(components, component_filters), 1)
+    compiled = measure(lambda: expand_compiled(components, component_filters), args.repeat)
+    expansions = len(components) * len(component_vars)
+    json.dump(dict(components=args.components, build_types=args.build_types, expansions=expansions,
+                   legacy_ms=legacy * 1000, compiled_cold_ms=compiled_cold * 1000,
+                   compiled_ms=compiled * 1000, speedup=legacy / compiled,
+                   join_cache={join.__name__: join.cache_info()._asdict() for join in joins}),
+              sys.stdout, indent=1)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Times the phases of CmakeConfigFindPackage on synthetic dependency graphs, without a
+Conan cache. Results are written as JSON, e.g.
+
+    python benchmarks/bench_generator.py --sizes 10 100 1000 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from synthetic_graph import SyntheticConanfile, synthetic_graph
+
+
+def _timed(method, timings: dict, phase: str):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings[phase] += time.perf_counter() - start
+    return wrapper
+
+
+def run_once(deps_cpp_info, output_folder: str) -> dict:
+    """Runs the generator once, the same way content and generate() do, timing every phase"""
+    from conans.util.files import save
+    from conanfile import CmakeConfigFindPackage
+
+    timings = dict.fromkeys(['deduction', 'components', 'rendering', 'writing'], 0.0)
+    start = time.perf_counter()
+    generator = CmakeConfigFindPackage(SyntheticConanfile(deps_cpp_info))
+    generator.output_path = output_folder
+    setup = time.perf_counter() - start
+    # Instance attributes, the generator itself is left untouched
+    generator._deduce_import_types = _timed(generator._deduce_import_types, timings, 'deduction')
+    generator._get_components_of_dependency = _timed(
+        generator._get_components_of_dependency, timings, 'components')
+    generator._render_template = _timed(generator._render_template, timings, 'rendering')
+
+    start = time.perf_counter()
+    files = generator.content
+    content = time.perf_counter() - start
+    start = time.perf_counter()
+    for file_name, file_content in files.items():
+        save(os.path.join(output_folder, file_name), file_content, only_if_modified=True)
+    timings['writing'] = time.perf_counter() - start
+    timings['setup'] = setup
+    # Whatever content spends outside of the timed methods, e.g. computing public deps
+    timings['other'] = content - timings['deduction'] - timings['components'] - timings['rendering']
+    timings['total'] = setup + content + timings['writing']
+    return dict(timings=timings, files=len(files),
+                bytes=sum(len(c.encode('utf-8')) for c in files.values()))
+
+
+def benchmark(work_folder: str, packages: int, components: int, repeat: int) -> dict:
+    graph_folder = os.path.join(work_folder, 'graph_{}_{}'.format(packages, components))
+    deps_cpp_info = synthetic_graph(graph_folder, packages, components)
+    runs = []
+    for _ in range(repeat):
+        output_folder = tempfile.mkdtemp(dir=work_folder)
+        runs.append(run_once(deps_cpp_info, output_folder))
+        shutil.rmtree(output_folder)
+    shutil.rmtree(graph_folder)
+    phases = runs[0]['timings'].keys()
+    return dict(packages=packages,
+                components_per_package=components,
+                repeat=repeat,
+                files=runs[0]['files'],
+                bytes=runs[0]['bytes'],
+                # The minimum is the least noisy estimate of what the code costs
+                min=dict((phase, min(run['timings'][phase] for run in runs)) for phase in phases),
+                mean=dict((phase, sum(run['timings'][phase] for run in runs) / len(runs))
+                          for phase in phases))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Number of packages of the graphs')
+    parser.add_argument('--components', type=int, nargs='+', default=[0, 5],
+                        help='Components per package, 0 for packages without components')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file to write, stdout by default')
+    args = parser.parse_args(argv)
+
+    work_folder = tempfile.mkdtemp(prefix='cfp_bench_')
+    # Keep persistent caches out of the user home, and measure the work without them
+    os.environ['CONAN_USER_HOME'] = work_folder
+    os.environ['CONAN_CFP_DEDUCTION_CACHE'] = 'False'
+    try:
+        results = []
+        for packages in args.sizes:
+            for components in args.components:
+                result = benchmark(work_folder, packages, components, args.repeat)
+                print('{} packages, {} components: {:.3f}s'.format(
+                    packages, components, result['min']['total']), file=sys.stderr)
+                results.append(result)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    report = dict(python=platform.python_version(), platform=platform.platform(),
+                  results=results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Checks that importing the generator module stays cheap and side-effect free. Conan
+loads it for every recipe evaluation, with its own modules already imported.
+
+    python benchmarks/bench_import.py --budget-ms 10
+
+Exits with 1 when the median import time exceeds the budget, when importing prints
+anything or when it imports modules that should only load while generating.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median import time allowed, also used by tests/test_import_budget.py
+budget_ms = 10.0
+
+# Only needed once files are generated
+lazy_modules = ['jinja2', 'concurrent.futures', 'CoffArchiveReader', 'DeductionCache',
+                'ImportLibraryTypeDeduction', 'LibraryDirectoryIndex', 'LibraryFileReader',
+                'RenderCache', 'VcvarsEnvironment']
+
+measure_script = """
+import json, sys, time
+# What the Conan client has imported by the time it loads a recipe
+import conans, conans.model, conans.tools, conans.client.generators
+sys.path.insert(0, {folder!r})
+before = set(sys.modules)
+start = time.perf_counter()
+import conanfile
+duration = time.perf_counter() - start
+print(json.dumps(dict(duration=duration, before=sorted(before),
+                      imported=sorted(set(sys.modules) - before))))
+"""
+
+
+def measure() -> dict:
+    process = subprocess.run([sys.executable, '-c', measure_script.format(folder=repository_folder)],
+                             capture_output=True, encoding='utf-8', check=True)
+    # The report is the last line, anything before was printed by the import
+    lines = process.stdout.splitlines()
+    result = json.loads(lines[-1])
+    result['output'] = '\n'.join(lines[:-1])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=budget_ms,
+                        help='Maximum median import time in milliseconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.repeat)]
+    median_ms = statistics.median(run['duration'] for run in runs) * 1000
+    imported = runs[0]['imported']
+    eager = [m for m in lazy_modules if m in imported and m not in runs[0]['before']]
+    errors = []
+    if median_ms > args.budget_ms:
+        errors.append('Import takes {:.1f}ms, over the budget of {}ms'.format(
+            median_ms, args.budget_ms))
+    if runs[0]['output']:
+        errors.append('Import printed:\n{}'.format(runs[0]['output']))
+    if eager:
+        errors.append('Imported eagerly: {}'.format(', '.join(eager)))
+
+    json.dump(dict(median_ms=median_ms, budget_ms=args.budget_ms, imported=imported,
+                   errors=errors), sys.stdout, indent=1)
+    print()
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Measures what the generated files cost at CMake configure time. A synthetic graph is
+generated, then configured by a consumer project calling find_package on every package,
+with CMake's --profiling-format=google-trace (CMake 3.18 or newer), e.g.
+
+    python benchmarks/profile_cmake.py --packages 100 --components 0 5 --output results.json
+
+Generator modes apply as usual, e.g. CONAN_CFP_IDEMPOTENT_CONFIGS=1.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_graph import SyntheticConanfile, synthetic_graph
+
+consumer_template = """cmake_minimum_required(VERSION 3.18)
+project(consumer NONE)
+set(CMAKE_BUILD_TYPE {build_type})
+list(APPEND CMAKE_PREFIX_PATH "{generated_folder}")
+{find_packages}
+add_library(consumer INTERFACE)
+target_link_libraries(consumer INTERFACE {targets})
+"""
+
+
+def generate(deps_cpp_info, generated_folder: str, build_type: str):
+    from conans.util.files import save
+    from conanfile import CmakeConfigFindPackage
+
+    generator = CmakeConfigFindPackage(SyntheticConanfile(deps_cpp_info, build_type))
+    generator.output_path = generated_folder
+    for file_name, content in generator.content.items():
+        save(os.path.join(generated_folder, file_name), content)
+    return generator
+
+
+def command_profile(trace_file: str):
+    """Inclusive and self time per command and self time per file, in microseconds"""
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        events = json.load(f)
+    commands = {}
+    files = {}
+    stacks = {}
+    for event in events:
+        stack = stacks.setdefault((event['pid'], event['tid']), [])
+        if event['ph'] == 'B':
+            stack.append(dict(name=event['name'], location=event.get('args', {}).get('location', ''),
+                              start=event['ts'], children=0))
+        elif event['ph'] == 'E' and stack:
+            frame = stack.pop()
+            duration = event['ts'] - frame['start']
+            if stack:
+                stack[-1]['children'] += duration
+            entry = commands.setdefault(frame['name'], dict(count=0, total_us=0, self_us=0))
+            entry['count'] += 1
+            entry['total_us'] += duration
+            entry['self_us'] += duration - frame['children']
+            file_name = frame['location'].rsplit(':', 1)[0]
+            files[file_name] = files.get(file_name, 0) + duration - frame['children']
+    return commands, files
+
+
+def profile(work_folder: str, cmake: str, packages: int, components: int, build_type: str,
+            top: int, repeat: int) -> dict:
+    case_folder = os.path.join(work_folder, 'graph_{}_{}'.format(packages, components))
+    deps_cpp_info = synthetic_graph(os.path.join(case_folder, 'packages'), packages, components)
+    generated_folder = os.path.join(case_folder, 'generated')
+    os.makedirs(generated_folder)
+    generator = generate(deps_cpp_info, generated_folder, build_type)
+
+    source_folder = os.path.join(case_folder, 'consumer')
+    os.makedirs(source_folder)
+    index = generator.graph_index
+    with open(os.path.join(source_folder, 'CMakeLists.txt'), 'w', encoding='utf-8') as f:
+        f.write(consumer_template.format(
+            build_type=build_type,
+            generated_folder=generated_folder.replace('\\', '/'),
+            find_packages='\n'.join('find_package({} CONFIG REQUIRED)'.format(index[pkg].filename)
+                                    for pkg in index.order),
+            targets=' '.join('{0}::{1}'.format(index[pkg].findname, pkg) for pkg in index.order)))
+
+    runs = []
+    for run in range(repeat):
+        # A fresh build folder each time, nothing is cached between configures
+        build_folder = os.path.join(case_folder, 'build')
+        shutil.rmtree(build_folder, ignore_errors=True)
+        trace_file = os.path.join(case_folder, 'trace_{}.json'.format(run))
+        start = time.perf_counter()
+        process = subprocess.run([cmake, '-S', source_folder, '-B', build_folder,
+                                  '--profiling-format=google-trace',
+                                  '--profiling-output={}'.format(trace_file)],
+                                 capture_output=True, encoding='utf-8')
+        duration = time.perf_counter() - start
+        if process.returncode != 0:
+            raise Exception("[profile_cmake] Configure failed:\n{}{}".format(process.stdout,
+                                                                           process.stderr))
+        runs.append((duration, trace_file))
+    duration, trace_file = min(runs)
+    commands, files = command_profile(trace_file)
+    top_commands = sorted(commands.items(), key=lambda item: item[1]['self_us'], reverse=True)
+    top_files = sorted(files.items(), key=lambda item: item[1], reverse=True)
+    return dict(packages=packages,
+                components_per_package=components,
+                build_type=build_type,
+                configure_seconds=duration,
+                commands=[dict(name=name, **entry) for name, entry in top_commands[:top]],
+                files=[dict(file=os.path.relpath(name, case_folder) if name else name, self_us=us)
+                       for name, us in top_files[:top]])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--packages', type=int, nargs='+', default=[100])
+    parser.add_argument('--components', type=int, nargs='+', default=[0, 5],
+                        help='Components per package, 0 for packages without components')
+    parser.add_argument('--build-type', default='Release')
+    parser.add_argument('--cmake', default='cmake', help='CMake executable, 3.18 or newer')
+    parser.add_argument('--top', type=int, default=15, help='Number of commands and files to report')
+    parser.add_argument('--repeat', type=int, default=1, help='Configures per graph, the fastest is kept')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated projects and traces')
+    parser.add_argument('--output', help='JSON file to write, stdout by default')
+    args = parser.parse_args(argv)
+
+    work_folder = tempfile.mkdtemp(prefix='cfp_cmake_profile_')
+    # Keep persistent caches out of the user home
+    os.environ['CONAN_USER_HOME'] = work_folder
+    try:
+        results = []
+        for packages in args.packages:
+            for components in args.components:
+                result = profile(work_folder, args.cmake, packages, components, args.build_type,
+                                 args.top, args.repeat)
+                print('{} packages, {} components: configure {:.3f}s, top commands: {}'.format(
+                    packages, components, result['configure_seconds'],
+                    ', '.join('{} {:.0f}ms'.format(c['name'], c['self_us'] / 1000)
+                              for c in result['commands'][:5])), file=sys.stderr)
+                results.append(result)
+    finally:
+        if args.keep:
+            print('Kept {}'.format(work_folder), file=sys.stderr)
+        else:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    cmake_version = subprocess.run([args.cmake, '--version'], capture_output=True,
+                                   encoding='utf-8').stdout.splitlines()[0]
+    report = dict(cmake=cmake_version, platform=platform.platform(), results=results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import os
+import random
+import struct
+import sys
+
+from conans.model.build_info import CppInfo, DepCppInfo, DepsCppInfo
+from conans.model.env_info import DepsEnvInfo, EnvInfo
+from conans.model.settings import Settings
+from conans.model.user_info import DepsUserInfo
+
+# The generator lives at the root of the repository
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repository_folder not in sys.path:
+    sys.path.insert(0, repository_folder)
+
+settings_yml = """
+os: [Windows, Linux, Macos]
+arch: [x86, x86_64, armv8]
+build_type: [None, Debug, Release, RelWithDebInfo, MinSizeRel]
+compiler:
+    gcc:
+        version: ["9"]
+    apple-clang:
+        version: ["13.0"]
+    Visual Studio:
+        version: ["16"]
+        toolset: [None]
+"""
+
+
+class SyntheticConanfile:
+    """Stand-in for the consumer conanfile, with just what the generator reads"""
+
+    def __init__(self, deps_cpp_info: DepsCppInfo, build_type: str = 'Release'):
+        self.deps_cpp_info = deps_cpp_info
+        self.deps_env_info = DepsEnvInfo()
+        self.env_info = EnvInfo()
+        self.deps_user_info = DepsUserInfo()
+        self.settings = Settings.loads(settings_yml)
+        self.settings.build_type = build_type
+        if sys.platform == 'win32':
+            self.settings.os = 'Windows'
+            self.settings.compiler = 'Visual Studio'
+            self.settings.compiler.version = '16'
+        elif sys.platform == 'darwin':
+            self.settings.os = 'Macos'
+            self.settings.compiler = 'apple-clang'
+            self.settings.compiler.version = '13.0'
+        else:
+            self.settings.os = 'Linux'
+            self.settings.compiler = 'gcc'
+            self.settings.compiler.version = '9'
+        self.settings.arch = 'x86_64'
+
+
+def static_archive(object_name: str) -> bytes:
+    """Smallest archive with one object member, read as a static library on all platforms"""
+    header = '{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n'.format(object_name + '/', 0, 0, 0, 644, 0)
+    return b'!<arch>\n' + header.encode('ascii')
+
+
+def shared_object() -> bytes:
+    """ELF header of a 64 bit shared object, without any sections"""
+    ident = b'\x7fELF' + bytes([2, 1, 1]) + bytes(9)
+    # e_type ET_DYN, e_machine x86_64, e_version, e_entry, e_phoff, e_shoff, e_flags,
+    # e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum, e_shstrndx
+    return ident + struct.pack('<HHIQQQIHHHHHH', 3, 62, 1, 0, 0, 0, 0, 64, 0, 0, 0, 0, 0)
+
+
+def _library_file(lib: str, shared: bool) -> tuple:
+    if sys.platform == 'win32':
+        # Static libraries only, import libraries would need their dll and lib /LIST
+        return lib + '.lib', static_archive(lib + '.obj')
+    if shared:
+        return 'lib{}.{}'.format(lib, 'dylib' if sys.platform == 'darwin' else 'so'), shared_object()
+    return 'lib{}.a'.format(lib), static_archive(lib + '.o')
+
+
+def synthetic_graph(root: str, packages: int, components: int = 0, max_requires: int = 3,
+                    seed: int = 0) -> DepsCppInfo:
+    """
+    Creates packages pkg0 to pkg<packages - 1> in root, with fake library files on disk.
+    Each package requires up to max_requires packages created before it, so the graph is
+    acyclic and contains diamonds. With components, each package has that many components
+    requiring the previous component of the package and the first one of its requirements.
+    """
+    rng = random.Random(seed)
+    deps_cpp_info = DepsCppInfo()
+    for index in range(packages):
+        pkg_name = 'pkg{}'.format(index)
+        rootpath = os.path.join(root, pkg_name)
+        for folder in ('include', 'lib', 'bin'):
+            os.makedirs(os.path.join(rootpath, folder), exist_ok=True)
+        requires = sorted(rng.sample(range(index), min(index, rng.randint(0, max_requires))))
+        requires = ['pkg{}'.format(r) for r in requires]
+
+        cpp_info = CppInfo(pkg_name, rootpath)
+        cpp_info.version = '1.{}.0'.format(index)
+        cpp_info.public_deps = requires
+        targets = [cpp_info]
+        if components:
+            targets = []
+            for comp_index in range(components):
+                comp_name = '{}_c{}'.format(pkg_name, comp_index)
+                component = cpp_info.components[comp_name]
+                if comp_index > 0:
+                    component.requires = ['{}_c{}'.format(pkg_name, comp_index - 1)]
+                else:
+                    component.requires = ['{0}::{0}_c0'.format(r) for r in requires]
+                targets.append(component)
+        for target_index, target in enumerate(targets):
+            lib = '{}_{}'.format(pkg_name, target_index)
+            target.libs = [lib]
+            target.defines = ['{}_DEFINE={}'.format(lib.upper(), target_index), 'WITH_SPACE="a b"']
+            target.cxxflags = ['-fvisibility=hidden']
+            target.system_libs = ['m'] if target_index == 0 else []
+            file_name, data = _library_file(lib, shared=(index + target_index) % 2 == 0)
+            with open(os.path.join(rootpath, 'lib', file_name), 'wb') as f:
+                f.write(data)
+        deps_cpp_info.add(pkg_name, DepCppInfo(cpp_info))
+    return deps_cpp_info
@@ -1,27 +1,27 @@
+import functools
+import hashlib
+import json
 import os
 import textwrap
-from this import d
+from typing import TYPE_CHECKING
 
-from jinja2 import Template, Environment, DictLoader, FileSystemLoader, select_autoescape
-
-from conans.client.generators.cmake import DepsCppCmake
-from conans.client.generators.cmake_find_package_common import (
-    find_transitive_dependencies)
 from conans.client.generators.cmake_multi import extend
-from conans.util.files import save
-from conans.client.tools.oss import OSInfo
-from conans.client.tools.win import vcvars_dict, environment_append
+from conans.util.files import load, save
+from conans.paths import get_conan_user_home
+from conans.tools import get_env
 from conans import ConanFile
 from conans.model import Generator
 from conans.model.conan_generator import GeneratorComponentsMixin
 
-from contextlib import contextmanager
-import subprocess
-import glob
-import copy
 from pathlib import Path
-from IndentedPrint import IndentedPrint
-from ImportLibraryTypeDeduction import ImportLibraryTypeDeduction
+from DependencyGraphIndex import DependencyGraphIndex
+from GenerationManifest import GenerationManifest
+from GeneratorTrace import GeneratorTrace
+
+# Conan loads this module for every recipe evaluation, Jinja and the import library
+# deduction are only imported once files are actually generated
+if TYPE_CHECKING:
+    from jinja2 import Environment
 
 
 class PackageSpec:
@@ -35,31 +35,76 @@ class PackageSpec:
         self.deps_names = []
 
 
+class ComponentView:
+    """
+    Read-through view on the cpp_info of a component, holding the extra attributes the
+    templates need. Avoids copying components, which can be large.
+    """
+    def __init__(self, component, public_deps: str, build_module_paths, import_lib_info: dict):
+        self._component = component
+        self.public_deps = public_deps
+        self.build_module_paths = build_module_paths
+        self.import_lib_info = import_lib_info
+
+    def __getattr__(self, item):
+        # Only called for attributes not found on the view itself
+        if item == '_component':
+            raise AttributeError(item)
+        return getattr(self._component, item)
+
+
 class BuildTypeSpec:
     def __init__(self):
         self.build_type = ''
         self.build_type_suffix = ''
 
 
-@contextmanager
-def run_with_env(env_dict):
-    with environment_append(env_dict):
-        yield
-
-
 class CmakeFilters:
 
+    @staticmethod
+    def compile_filter(filter_obj):
+        """Callable applying the filter of a component_vars mapping, with its arguments bound"""
+        name = filter_obj.get('filter')
+        if name is None or name == 'None':
+            return lambda values: values
+        function = getattr(CmakeFilters, name, None)
+        if function is None:
+            raise Exception("Unknown filter {}".format(name))
+        args = filter_obj.get('filterargs')
+        if not args:
+            return function
+        return lambda values: function(values, *args)
+
     @staticmethod
     def cmake_apply_filter(paths, filter_obj):
-        if not 'filter' in filter_obj or filter_obj['filter'] == 'None':
-            return paths
-        if hasattr(CmakeFilters, filter_obj['filter']):
-            if 'filterargs' in filter_obj:
-                return getattr(CmakeFilters, filter_obj['filter']).__call__(paths, *filter_obj['filterargs'])
-            else:
-                return getattr(CmakeFilters, filter_obj['filter']).__call__(paths)
-        else:
-            raise Exception("Unknown filter {}".format(filter_obj['filter']))
+        return CmakeFilters.compile_filter(filter_obj)(paths)
+
+    # Components and build types of a package mostly share their directories and flags,
+    # the joins are memoized per list of values
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _pathsjoin(paths: tuple) -> str:
+        return "\n\t\t\t".join('"%s"'
+                               % p.replace('\\', '/').replace('$', '\\$').replace('"', '\\"')
+                               for p in paths)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _flagsjoin(values: tuple, separator: str) -> str:
+        return separator.join(v.replace('\\', '\\\\').replace('$', '\\$').replace('"', '\\"')
+                              for v in values)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _definesjoin(values: tuple, prefix: str) -> str:
+        return "\n\t\t\t".join('"%s%s"' % (prefix, v.replace('\\', '\\\\').replace('$', '\\$').
+                                           replace('"', '\\"'))
+                               for v in values)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _pathsjoinsingle(paths: tuple) -> str:
+        return '"%s"' % ";".join(p.replace('\\', '/').replace('$', '\\$') for p in paths)
 
     @staticmethod
     def cmake_pathsjoin(paths):
@@ -67,22 +112,17 @@ class CmakeFilters:
         Paths are doubled quoted, and escaped (but spaces)
         e.g: set(LIBFOO_INCLUDE_DIRS "/path/to/included/dir" "/path/to/included/dir2")
         """
-        return "\n\t\t\t".join('"%s"'
-                               % p.replace('\\', '/').replace('$', '\\$').replace('"', '\\"')
-                               for p in paths)
+        return CmakeFilters._pathsjoin(tuple(paths))
 
     @staticmethod
     def cmake_flagsjoin(values, separator=' '):
         # Flags have to be escaped
-        return separator.join(v.replace('\\', '\\\\').replace('$', '\\$').replace('"', '\\"')
-                              for v in values)
+        return CmakeFilters._flagsjoin(tuple(values), separator)
 
     @staticmethod
     def cmake_definesjoin(values, prefix=""):
         # Defines have to be escaped, included spaces
-        return "\n\t\t\t".join('"%s%s"' % (prefix, v.replace('\\', '\\\\').replace('$', '\\$').
-                                           replace('"', '\\"'))
-                               for v in values)
+        return CmakeFilters._definesjoin(tuple(values), prefix)
 
     @staticmethod
     def cmake_pathsjoinsingle(values):
@@ -90,7 +130,7 @@ class CmakeFilters:
         semicolon-separated list of dirs:
         e.g: set(LIBFOO_INCLUDE_DIR "/path/to/included/dir;/path/to/included/dir2")
         """
-        return '"%s"' % ";".join(p.replace('\\', '/').replace('$', '\\$') for p in values)
+        return CmakeFilters._pathsjoinsingle(tuple(values))
 
     @staticmethod
     def format_link_flags(link_flags):
@@ -100,6 +140,9 @@ class CmakeFilters:
 
 class CMakeData:
 
+    macros_filename = "conan_macros.cmake"
+    macros_include = 'include("${CMAKE_CURRENT_LIST_DIR}/%s")' % macros_filename
+
     cmake_version_check = textwrap.dedent("""
         # Requires CMake > 3.0
         if(${{CMAKE_VERSION}} VERSION_LESS "3.0")
@@ -133,15 +176,21 @@ class CMakeData:
         function(conan_package_library_targets)
             # Old args: libraries package_libdir deps out_libraries out_libraries_target build_type package_name
             set(_FLAGS HAS_IMPORTLIB)
-            set(_KV_ARGS LIB_TYPE OUT_LIBS OUT_LIB_TARGETS BUILD_TYPE PACKAGE_NAME IMPORTED_LOCATION)
-            set(_K_MULTI_V_ARGS LIBRARIES LIBDIRS DEPENDENDCIES)
+            set(_KV_ARGS LIB_TYPE OUT_LIBS OUT_LIB_TARGETS BUILD_TYPE PACKAGE_NAME IMPORTED_LOCATION SONAME)
+            set(_K_MULTI_V_ARGS LIBRARIES LIBDIRS DEPENDENDCIES RESOLVED_LIBRARIES RESOLVED_PATHS)
             cmake_parse_arguments(IN "${_FLAGS}" "${_KV_ARGS}" "${_K_MULTI_V_ARGS}" ${ARGN})
             
             unset(_CONAN_ACTUAL_TARGETS CACHE)
             unset(_CONAN_FOUND_SYSTEM_LIBS CACHE)
             foreach(_LIBRARY_NAME ${IN_LIBRARIES})
-                find_library(CONAN_FOUND_LIBRARY NAME ${_LIBRARY_NAME} PATHS ${IN_LIBDIRS}
-                             NO_DEFAULT_PATH NO_CMAKE_FIND_ROOT_PATH)
+                # Libraries already resolved by the generator do not need find_library
+                list(FIND IN_RESOLVED_LIBRARIES "${_LIBRARY_NAME}" _RESOLVED_INDEX)
+                if(_RESOLVED_INDEX GREATER -1)
+                    list(GET IN_RESOLVED_PATHS ${_RESOLVED_INDEX} CONAN_FOUND_LIBRARY)
+                else()
+                    find_library(CONAN_FOUND_LIBRARY NAME ${_LIBRARY_NAME} PATHS ${IN_LIBDIRS}
+                                 NO_DEFAULT_PATH NO_CMAKE_FIND_ROOT_PATH)
+                endif()
                 if(CONAN_FOUND_LIBRARY)
                     conan_message(STATUS "Library ${_LIBRARY_NAME} found ${CONAN_FOUND_LIBRARY}")
                     list(APPEND _out_libraries ${CONAN_FOUND_LIBRARY})
@@ -151,7 +200,7 @@ class CMakeData:
                     set(_LIB_NAME CONAN_LIB::${IN_PACKAGE_NAME}_${_LIBRARY_NAME}${IN_BUILD_TYPE})
                     if(NOT TARGET ${_LIB_NAME})
                         # Create a micro-target for each lib/a found
-                        if(${IN_LIB_TYPE})
+                        if(IN_LIB_TYPE STREQUAL "SHARED" OR IN_LIB_TYPE STREQUAL "STATIC")
                             add_library(${_LIB_NAME} ${IN_LIB_TYPE} IMPORTED)
                         else()
                             add_library(${_LIB_NAME} UNKNOWN IMPORTED)
@@ -162,6 +211,10 @@ class CMakeData:
                         else()
                             set_target_properties(${_LIB_NAME} PROPERTIES IMPORTED_LOCATION ${CONAN_FOUND_LIBRARY})
                         endif()
+                        if(IN_SONAME AND IN_LIB_TYPE STREQUAL "SHARED")
+                            # Read from the library by the generator
+                            set_target_properties(${_LIB_NAME} PROPERTIES IMPORTED_SONAME ${IN_SONAME})
+                        endif()
                         set(_CONAN_ACTUAL_TARGETS ${_CONAN_ACTUAL_TARGETS} ${_LIB_NAME})
                     else()
                         conan_message(STATUS "Skipping already existing target: ${_LIB_NAME}")
@@ -176,6 +229,7 @@ class CMakeData:
                     set(_CONAN_FOUND_SYSTEM_LIBS "${_CONAN_FOUND_SYSTEM_LIBS};${_LIBRARY_NAME}")
                 endif()
                 unset(CONAN_FOUND_LIBRARY CACHE)
+                unset(CONAN_FOUND_LIBRARY)
             endforeach()
 
             # Add all dependencies to all targets
@@ -207,9 +261,19 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
         'SYSTEM_LIBS': dict(key='system_libs', filter='cmake_flagsjoin', filterargs=[' ']),
         'FRAMEWORK_DIRS': dict(key='framework_paths', filter='cmake_pathsjoin'),
         'FRAMEWORKS': dict(key='frameworks', filter='cmake_flagsjoin', filterargs=[' ']),
-        'BUILD_MODULES_PATHS': dict(key='build_modules_paths'),
+        'BUILD_MODULES_PATHS': dict(key='build_module_paths', filter='cmake_pathsjoin'),
         'DEPENDENCIES': dict(key='public_deps')
     }
+    template_folder = str(Path(__file__).parent.resolve())
+    compiled_templates_folder = os.path.join(template_folder, 'compiled_templates')
+    # Template environments per template and bytecode folder, see template_environment
+    _template_environments = {}
+    _generator_version = None
+    # cpp_info fields the generated files depend on, see _dependency_fingerprint
+    # build_module_paths is set while rendering, from build_modules_paths
+    _fingerprint_fields = sorted(({mapping['key'] for mapping in component_vars.values()} | {
+        'rootpath', 'version', 'libdirs', 'bindirs', 'build_paths', 'build_modules_paths',
+        'sharedlinkflags', 'exelinkflags', 'requires'}) - {'build_module_paths'})
 
     def __init__(self, conanfile):
         super(CmakeConfigFindPackage, self).__init__(conanfile)
@@ -219,22 +283,134 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
         # FIXME: Ugly way to define the output path
         self.output_path = os.getcwd()
 
-        self.template_env = Environment(
-            loader=FileSystemLoader(str(Path(__file__).parent.resolve())),
-            autoescape=select_autoescape()
-        )
         self._macros_and_functions = "\n".join([
             CMakeData.conan_message,
             CMakeData.apple_frameworks_macro,
             CMakeData.conan_package_library_targets,
         ])
-        CmakeConfigFindPackage.setup_cmake_filters(
-            self.template_env)
+        # Identifies the macros, so a CMake run defines each version only once
+        self._macros_version = hashlib.sha1(
+            self._macros_and_functions.encode('utf-8')).hexdigest()[:12]
+
+        # The component_vars mappings with their filter resolved, expanded for every component
+        self.component_filters = [(cmake_name, mapping['key'], CmakeFilters.compile_filter(mapping))
+                                  for cmake_name, mapping in self.component_vars.items()]
+
+        # Spans and counters of the run, written to CONAN_CFP_TRACE when set
+        self.trace_file = get_env('CONAN_CFP_TRACE', '')
+        self.trace = GeneratorTrace(enabled=bool(self.trace_file))
+        # Input of the run, to regenerate the files with DependencySnapshot.py
+        self.snapshot_file = get_env('CONAN_CFP_SNAPSHOT', '')
+
+        # Persistent data shared between runs lives in the Conan user home
+        self.cache_folder = get_env('CONAN_CFP_CACHE_FOLDER', os.path.join(
+            get_conan_user_home(), '.conan', 'cmake_config_find_package'))
+        self._template_env = None
+        self._library_deduce = None
+        self._graph_index = None
+        self._render_cache = None
+        self.deduction_workers = get_env('CONAN_CFP_DEDUCTION_WORKERS',
+                                         min(32, (os.cpu_count() or 1) + 4))
+        # Render the files of every build type in self.configurations, not only the current one
+        self.all_build_types = get_env('CONAN_CFP_ALL_BUILD_TYPES', False)
+        # Import library info per (package, component, build type), filled before rendering
+        self._import_lib_infos = {}
+        # Generation modes, exposed to all templates
+        self.render_options = dict(
+            # Write the library paths found by the generator, instead of find_library in CMake
+            resolved_library_paths=get_env('CONAN_CFP_RESOLVED_LIBRARY_PATHS', False),
+            # Skip files that were already loaded, for diamond-shaped dependency graphs
+            idempotent_configs=get_env('CONAN_CFP_IDEMPOTENT_CONFIGS', False),
+        )
+
+    @property
+    def template_env(self) -> 'Environment':
+        if self._template_env is None:
+            self._template_env = CmakeConfigFindPackage.template_environment(
+                os.path.join(self.cache_folder, 'templates')
+                if get_env('CONAN_CFP_TEMPLATE_CACHE', True) else None)
+        return self._template_env
+
+    @property
+    def graph_index(self) -> DependencyGraphIndex:
+        if self._graph_index is None:
+            with self.trace.span('graph_index'):
+                self._graph_index = DependencyGraphIndex(self, self.deps_build_info.dependencies)
+        return self._graph_index
+
+    @property
+    def render_cache(self):
+        """Rendered files shared between projects, None unless CONAN_CFP_RENDER_CACHE is set"""
+        if self._render_cache is None and get_env('CONAN_CFP_RENDER_CACHE', False):
+            from RenderCache import RenderCache
+            self._render_cache = RenderCache(
+                os.path.join(self.cache_folder, 'rendered'),
+                get_env('CONAN_CFP_RENDER_CACHE_MAX_SIZE', 256 * 1024 * 1024),
+                link=get_env('CONAN_CFP_RENDER_CACHE_LINK', True), trace=self.trace)
+        return self._render_cache
 
-        self.library_deduce = ImportLibraryTypeDeduction(conanfile)
+    @property
+    def library_deduce(self):
+        if self._library_deduce is None:
+            from DeductionCache import DeductionCache
+            from ImportLibraryTypeDeduction import ImportLibraryTypeDeduction
+            deduction_cache = None
+            if get_env('CONAN_CFP_DEDUCTION_CACHE', True):
+                deduction_cache = DeductionCache(
+                    os.path.join(self.cache_folder, 'import_library_cache.json'),
+                    get_env('CONAN_CFP_DEDUCTION_CACHE_MAX_SIZE', 4 * 1024 * 1024))
+            self._library_deduce = ImportLibraryTypeDeduction(
+                self.conanfile, cache=deduction_cache, trace=self.trace,
+                lib_reader=get_env('CONAN_CFP_LIB_READER', 'coff'),
+                vcvars_cache_file=os.path.join(self.cache_folder, 'vcvars_cache.json')
+                if get_env('CONAN_CFP_VCVARS_CACHE', False) else None)
+        return self._library_deduce
 
     @staticmethod
-    def setup_cmake_filters(env: Environment):
+    def _create_template_environment(loader, bytecode_cache=None) -> 'Environment':
+        from jinja2 import Environment, select_autoescape
+        env = Environment(
+            loader=loader,
+            autoescape=select_autoescape(),
+            bytecode_cache=bytecode_cache
+        )
+        CmakeConfigFindPackage.setup_cmake_filters(env)
+        return env
+
+    @classmethod
+    def template_environment(cls, bytecode_folder: str = None) -> 'Environment':
+        """
+        Template environment shared by all generator instances of the process, so templates
+        are only compiled once. Compiled templates are also kept in bytecode_folder, Jinja
+        invalidates them when the hash of the template source changes.
+        """
+        key = (cls.template_folder, bytecode_folder)
+        if key not in cls._template_environments:
+            from jinja2 import (ChoiceLoader, FileSystemBytecodeCache, FileSystemLoader,
+                                ModuleLoader)
+            loader = FileSystemLoader(cls.template_folder)
+            if os.path.isdir(cls.compiled_templates_folder):
+                # Shipped with the exported recipe, see CmakeConfigFindPackagePackage.export
+                loader = ChoiceLoader(
+                    [ModuleLoader(cls.compiled_templates_folder), loader])
+            bytecode_cache = None
+            if bytecode_folder:
+                os.makedirs(bytecode_folder, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(bytecode_folder)
+            cls._template_environments[key] = cls._create_template_environment(
+                loader, bytecode_cache)
+        return cls._template_environments[key]
+
+    @classmethod
+    def precompile_templates(cls, target_folder: str):
+        """Compiles all templates to Python modules, loaded by template_environment"""
+        from jinja2 import FileSystemLoader
+        env = cls._create_template_environment(FileSystemLoader(cls.template_folder))
+        env.compile_templates(target_folder, extensions=['jinja'], zip=None,
+                              ignore_errors=False)
+
+    @staticmethod
+    def setup_cmake_filters(env: 'Environment'):
         env.filters['cmake_val'] = lambda x: '${'+x+'}'
         env.filters['cmake_value'] = lambda x: '${'+x+'}'
         env.filters['cmake_pathsjoin'] = CmakeFilters.cmake_pathsjoin
@@ -246,10 +422,179 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
             formatstr.format(v) for v in values]
 
     def generate(self):
-        generator_files = self.content
-        for generator_file, content in generator_files.items():
-            generator_file = os.path.join(self.output_path, generator_file)
-            save(generator_file, content)
+        """
+        Incremental generation: only packages whose fingerprint changed since the previous
+        run are rendered, only files whose content changed are written, and files of
+        packages that are no longer dependencies are removed.
+        """
+        manifest = GenerationManifest(self.output_path)
+        manifest.load()
+        buildtype_specs = self._buildtype_specs()
+        # With all build types, a package is up to date when the current one is
+        build_type = buildtype_specs[0].build_type
+        dependencies = list(self.deps_build_info.dependencies)
+        fingerprints = {pkg_name: self._dependency_fingerprint(pkg_name, cpp_info, buildtype_specs)
+                        for pkg_name, cpp_info in dependencies}
+        changed = [(pkg_name, cpp_info) for pkg_name, cpp_info in dependencies
+                   if not manifest.is_up_to_date(pkg_name, build_type, fingerprints[pkg_name])]
+
+        for generator_file, content in self._shared_files().items():
+            self._save(generator_file, content)
+        old_files = manifest.files()
+        for pkg_name in set(manifest.packages) - set(fingerprints):
+            manifest.remove_package(pkg_name)
+        rendered, cached = self._cached_package_files(changed, buildtype_specs, fingerprints)
+        for pkg_name, generator_files in rendered.items():
+            for generator_file, content in generator_files.items():
+                self._save(generator_file, content)
+            self._update_manifest(manifest, pkg_name, buildtype_specs, fingerprints[pkg_name],
+                                  generator_files)
+        for pkg_name, cached_files in cached.items():
+            with self.trace.span('install_cached', package=pkg_name):
+                for generator_file, cached_file in cached_files.items():
+                    self.render_cache.install(cached_file,
+                                              os.path.join(self.output_path, generator_file))
+            self._update_manifest(manifest, pkg_name, buildtype_specs, fingerprints[pkg_name],
+                                  cached_files)
+        # Files that are not generated anymore for any package and build type
+        for stale_file in old_files - manifest.files():
+            stale_file = os.path.join(self.output_path, stale_file)
+            if os.path.exists(stale_file):
+                os.remove(stale_file)
+                self.trace.count('files_removed')
+        # Lists the per build type files that remain, including those of other runs
+        for pkg_name, _ in changed:
+            target_files = {}
+            self._render_target_files(self.graph_index[pkg_name].filename, target_files)
+            for generator_file, content in target_files.items():
+                self._save(generator_file, content)
+        manifest.save()
+        self._save_snapshot()
+        self._save_trace()
+
+    def _update_manifest(self, manifest, pkg_name, buildtype_specs, fingerprint, files):
+        """Records the files of a package, the per build type files under their build type"""
+        pkg_filename = self.graph_index[pkg_name].filename
+        files = set(files) | {self._target_files_filename(pkg_filename)}
+        buildtype_files = {bt.build_type: files & {self._targets_filename(pkg_filename, bt.build_type.lower())}
+                           for bt in buildtype_specs[1:]}
+        buildtype_files[buildtype_specs[0].build_type] = files.difference(*buildtype_files.values())
+        for build_type, generator_files in buildtype_files.items():
+            manifest.update(pkg_name, build_type, fingerprint, generator_files)
+
+    def _save(self, generator_file, content):
+        generator_path = os.path.join(self.output_path, generator_file)
+        with self.trace.span('save', file=generator_file, bytes=len(content)):
+            if os.path.isfile(generator_path) and os.stat(generator_path).st_nlink > 1 \
+                    and load(generator_path) != content:
+                # Hardlinked from the render cache, writing in place would modify the cached file
+                os.remove(generator_path)
+            save(generator_path, content, only_if_modified=True)
+        self.trace.count('bytes_saved', len(content))
+        self.trace.count('files_saved')
+
+    def _save_snapshot(self):
+        if self.snapshot_file:
+            from DependencySnapshot import DependencySnapshot
+            with self.trace.span('save_snapshot'):
+                DependencySnapshot.save(self.deps_build_info, self.conanfile.settings,
+                                        os.path.join(self.output_path, self.snapshot_file))
+
+    def _save_trace(self):
+        if self.trace_file:
+            self.trace.save(os.path.join(self.output_path, self.trace_file))
+
+    @classmethod
+    def generator_version(cls) -> str:
+        """Hash of the templates and the generator sources, changes whenever the output might"""
+        if cls._generator_version is None:
+            sha = hashlib.sha256()
+            for source in sorted(os.listdir(cls.template_folder)):
+                if source.endswith(('.jinja', '.py')):
+                    sha.update(source.encode('utf-8'))
+                    sha.update(Path(cls.template_folder, source).read_bytes())
+            cls._generator_version = sha.hexdigest()
+        return cls._generator_version
+
+    def _dependency_fingerprint(self, pkg_name, cpp_info, buildtype_specs) -> str:
+        """Hash of everything the files of a package are rendered from"""
+        def values(obj):
+            return {field: getattr(obj, field, None) for field in self._fingerprint_fields}
+
+        extended = [extend(cpp_info, bt.build_type.lower()) for bt in buildtype_specs]
+        cpp_info = extended[0]
+        node = self.graph_index[pkg_name]
+        data = dict(generator=self.generator_version(),
+                    render_options=self.render_options,
+                    build_types=[bt.build_type for bt in buildtype_specs],
+                    configurations=self.configurations,
+                    name=node.findname,
+                    filename=node.filename,
+                    cpp_info=[values(it) for it in extended],
+                    public_deps=node.deps_names,
+                    public_deps_filenames=node.public_deps_filenames)
+        if cpp_info.components:
+            data['components'] = [(comp_genname, values(comp), comp_requires_gennames)
+                                  for comp_genname, comp, comp_requires_gennames
+                                  in self._get_components(pkg_name, cpp_info)]
+        # The import types are deduced from the library files, they change with them
+        data['libraries'] = [self._library_stats(it) for it in extended]
+        if cpp_info.components:
+            data['component_libraries'] = [
+                [self._library_stats(comp) for _, comp, _ in self._get_components(pkg_name, it)]
+                for it in extended]
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _library_stats(self, cpp_info) -> list:
+        """Path, size and mtime of the library files of cpp_info"""
+        stats = []
+        for lib_file in self.library_deduce.find_libraries(cpp_info)[0]:
+            try:
+                stat = os.stat(lib_file)
+                stats.append((lib_file, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                # Dangling symlink
+                stats.append((lib_file, None, None))
+        return stats
+
+    def _package_references(self) -> dict:
+        """Package reference with package_id per package name, empty outside of a Conan graph"""
+        try:
+            return {dep.ref.name: str(dep.pref) for dep in self.conanfile.dependencies.host.values()}
+        except AttributeError:
+            # Stand-in conanfiles, e.g. DependencySnapshot.py, have no dependencies
+            return {}
+
+    def _render_cache_key(self, pkg_name, fingerprint, references: dict) -> str:
+        # The fingerprint covers the generator version, the build types and the package folder
+        data = dict(name=pkg_name, reference=references.get(pkg_name), fingerprint=fingerprint)
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _cached_package_files(self, dependencies, buildtype_specs, fingerprints) -> tuple:
+        """
+        Files of the given dependencies, rendered per package name, plus the paths of the
+        files found in the render cache per package name
+        """
+        render_cache = self.render_cache
+        if render_cache is None:
+            return self._package_files(dependencies, buildtype_specs), {}
+        references = self._package_references()
+        keys = {pkg_name: self._render_cache_key(pkg_name, fingerprints[pkg_name], references)
+                for pkg_name, _ in dependencies}
+        cached = {}
+        with self.trace.span('render_cache_lookup'):
+            for pkg_name, _ in dependencies:
+                cached_files = render_cache.get(keys[pkg_name])
+                if cached_files is not None:
+                    cached[pkg_name] = cached_files
+        rendered = self._package_files(
+            [(pkg_name, cpp_info) for pkg_name, cpp_info in dependencies if pkg_name not in cached],
+            buildtype_specs)
+        with self.trace.span('render_cache_store'):
+            for pkg_name, generator_files in rendered.items():
+                render_cache.put(keys[pkg_name], generator_files)
+            render_cache.evict()
+        return rendered, cached
 
     @property
     def filename(self):
@@ -259,79 +604,142 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
     def _get_filename(cls, obj):
         return obj.get_filename(cls.name)
 
-    def _get_components_of_dependency(self, pkg_name, cpp_info):
+    def _build_module_paths(self, cpp_info) -> list:
+        """
+        Build modules declared for this generator, or else for cmake_find_package_multi,
+        which also holds the modules that recipes declare as a plain list
+        """
+        return cpp_info.build_modules_paths.get(self.name) or \
+            cpp_info.build_modules_paths.get('cmake_find_package_multi', [])
+
+    def _get_components_of_dependency(self, pkg_name, cpp_info, bt: BuildTypeSpec):
         components = super(CmakeConfigFindPackage,
                            self)._get_components(pkg_name, cpp_info)
         ret = []
         for comp_genname, comp, comp_requires_gennames in components:
-            deps_cpp_cmake = copy.deepcopy(comp)
-
-            deps_cpp_cmake.public_deps = " ".join(
-                ["{}::{}".format(*it) for it in comp_requires_gennames])
-            deps_cpp_cmake.build_module_paths = cpp_info.build_modules_paths.get(
-                self.name, [])
-            import_lib_info = self.library_deduce.import_library_info_from_cppinfo(
-                deps_cpp_cmake)
-            deps_cpp_cmake.import_lib_info = import_lib_info
+            self.trace.count('components')
+            deps_cpp_cmake = ComponentView(
+                comp,
+                public_deps=" ".join(
+                    ["{}::{}".format(*it) for it in comp_requires_gennames]),
+                # Each component includes its own modules, the package ones are their union
+                build_module_paths=self._build_module_paths(comp),
+                import_lib_info=self._import_lib_infos[(
+                    pkg_name, comp_genname, bt.build_type)])
             ret.append((comp_genname, deps_cpp_cmake))
         return ret
 
+    def _deduction_jobs(self, dependencies, buildtype_specs):
+        """Yields the key and cpp_info of every package and component to deduce the import type of"""
+        for bt in buildtype_specs:
+            for pkg_name, cpp_info in dependencies:
+                cpp_info = extend(cpp_info, bt.build_type.lower())
+                yield (pkg_name, None, bt.build_type), cpp_info
+                if cpp_info.components:
+                    self._validate_components(cpp_info)
+                    for comp_genname, comp, _ in self._get_components(pkg_name, cpp_info):
+                        yield (pkg_name, comp_genname, bt.build_type), comp
+
+    @staticmethod
+    def _deduction_input(cpp_info):
+        """What the import library info is deduced from, equal inputs have equal results"""
+        return (cpp_info.rootpath, tuple(cpp_info.libs), tuple(cpp_info.libdirs),
+                tuple(cpp_info.bindirs))
+
+    def _deduce_import_types(self, dependencies, buildtype_specs):
+        from concurrent.futures import ThreadPoolExecutor
+        # Deduction mostly waits on the filesystem and subprocesses, so run it on a thread pool
+        jobs = list(self._deduction_jobs(dependencies, buildtype_specs))
+        # Created on first use, before the workers share it
+        library_deduce = self.library_deduce
+        with ThreadPoolExecutor(max_workers=self.deduction_workers) as executor:
+            # Build types without specific libraries resolve to the same files, deduce them once
+            futures = {}
+            for key, cpp_info in jobs:
+                deduction_input = self._deduction_input(cpp_info)
+                if deduction_input in futures:
+                    self.trace.count('deductions_shared')
+                else:
+                    futures[deduction_input] = executor.submit(
+                        self._deduce_import_type, library_deduce, key, cpp_info)
+            # Collect in submission order to keep the output deterministic
+            self._import_lib_infos.update((key, futures[self._deduction_input(cpp_info)].result())
+                                          for key, cpp_info in jobs)
+
+    def _deduce_import_type(self, library_deduce, key, cpp_info):
+        pkg_name, comp_genname, build_type = key
+        with self.trace.span('deduce', package=pkg_name, component=comp_genname,
+                             build_type=build_type):
+            return library_deduce.import_library_info_from_cppinfo(cpp_info)
+
     def _render_template_str(self, template_name, **kwargs):
         # Add some defaults that we always expose
         return self.template_env.get_template(template_name).render(
-            cmake_version_check=CMakeData.cmake_version_check,
+            cmake_version_check=CMakeData.cmake_version_check.format(),
             macros_and_functions=self._macros_and_functions,
+            macros_include=CMakeData.macros_include,
+            **self.render_options,
             **kwargs)
 
     def _render_template(self, template_name, output_name, output: dict[str, str], **kwargs):
-        output[output_name] = self._render_template_str(
-            template_name, **kwargs)
+        with self.trace.span('render', template=template_name, file=output_name) as args:
+            output[output_name] = self._render_template_str(
+                template_name, **kwargs)
+            args['bytes'] = len(output[output_name])
 
     def generate_dependency_with_components(self, cpp_info, pkg: PackageSpec, bt: BuildTypeSpec, output_files: dict[str, str]):
-        cpp_info = extend(cpp_info, bt.build_type.lower())
-
-        cpp_info.import_lib_info = self.library_deduce.import_library_info_from_cppinfo(
-            cpp_info)
-        # Tuple of name, weird FindPackageGen object and cpp_info
-        components = self._get_components_of_dependency(pkg.name, cpp_info)
-
-        # Note these are in reversed order, from more dependent to less dependent
-        pkg_components = " ".join(["{p}::{c}".format(p=pkg.namespace, c=comp_findname) for
-                                   comp_findname, _ in reversed(components)])
+        cpp_info, components = self.generate_buildtype_with_components(cpp_info, pkg, bt, output_files)
         render_args = dict(pkg=pkg,
                            components=components,
                            build_type=bt.build_type
                            )
-        self._render_template('target_buildtype_components.jinja', self._targets_filename(pkg.filename, bt.build_type.lower()), output_files,
-                              **render_args,
-                              component_vars=self.component_vars,
-                              pkg_components=pkg_components,
-                              deps=cpp_info
-                              )
         self._render_template('targets.jinja', self._targets_filename(pkg.filename), output_files,
                               **render_args
                               )
         self._render_template('config_components.jinja', self._config_filename(pkg.filename), output_files,
                               **render_args,
                               pkg_public_deps=pkg.public_deps_filenames,
+                              public_deps_filenames=pkg.public_deps_filenames,
+                              targets_filename=self._targets_filename(pkg.filename),
                               configs=self.configurations
                               )
 
+    def generate_buildtype_with_components(self, cpp_info, pkg: PackageSpec, bt: BuildTypeSpec, output_files: dict[str, str]):
+        """Renders the file of a single build type, returns the extended cpp_info and the components"""
+        cpp_info = extend(cpp_info, bt.build_type.lower())
+
+        cpp_info.import_lib_info = self._import_lib_infos[(
+            pkg.name, None, bt.build_type)]
+        cpp_info.build_module_paths = self._build_module_paths(cpp_info)
+        # Tuple of name, weird FindPackageGen object and cpp_info
+        components = self._get_components_of_dependency(pkg.name, cpp_info, bt)
+
+        # Note these are in reversed order, from more dependent to less dependent
+        pkg_components = " ".join(["{p}::{c}".format(p=pkg.namespace, c=comp_findname) for
+                                   comp_findname, _ in reversed(components)])
+        self._render_template('target_buildtype_components.jinja', self._targets_filename(pkg.filename, bt.build_type.lower()), output_files,
+                              pkg=pkg,
+                              components=components,
+                              build_type=bt.build_type,
+                              component_filters=self.component_filters,
+                              pkg_components=pkg_components,
+                              deps=cpp_info
+                              )
+        return cpp_info, components
+
     def generate_dependency_without_components(self, cpp_info, pkg: PackageSpec, bt: BuildTypeSpec, output_files: dict[str, str]):
         self._render_template('config_single.jinja', self._config_filename(pkg.filename), output_files,
+                              pkg=pkg,
                               filename=pkg.filename,
+                              targets_filename=self._targets_filename(pkg.filename),
                               name=pkg.findname,
                               namespace=pkg.namespace,
                               version=cpp_info.version,
-                              public_deps_filenames=pkg.public_deps_filenames
+                              public_deps_filenames=pkg.public_deps_filenames,
+                              configs=self.configurations
                               )
 
-        # If any config matches the build_type one, add it to the cpp_info
-        dep_cpp_info = extend(cpp_info, bt.build_type.lower())
-
-        # Get import type
-        dep_cpp_info.import_lib_info = self.library_deduce.import_library_info_from_cppinfo(
-            dep_cpp_info)
+        dep_cpp_info = self.generate_buildtype_without_components(cpp_info, pkg, bt, output_files)
 
         # Targets of the package
         self._render_template('targets.jinja', self._targets_filename(pkg.filename), output_files,
@@ -340,29 +748,38 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
                               import_type=dep_cpp_info.import_lib_info
                               )
 
+    def generate_buildtype_without_components(self, cpp_info, pkg: PackageSpec, bt: BuildTypeSpec, output_files: dict[str, str]):
+        """Renders the file of a single build type, returns the extended cpp_info"""
+        # If any config matches the build_type one, add it to the cpp_info
+        dep_cpp_info = extend(cpp_info, bt.build_type.lower())
+
+        # Get import type
+        dep_cpp_info.import_lib_info = self._import_lib_infos[(
+            pkg.name, None, bt.build_type)]
+        dep_cpp_info.build_module_paths = self._build_module_paths(dep_cpp_info)
+
         #deps = DepsCppCmake(dep_cpp_info, self.name)
         # Config for build type
-        self._render_template('target_buildtype_single.jinja', self._targets_filename(pkg.filename, self.configuration.lower()), output_files,
-                              component_vars=self.component_vars,
+        self._render_template('target_buildtype_single.jinja', self._targets_filename(pkg.filename, bt.build_type.lower()), output_files,
+                              component_filters=self.component_filters,
                               name=pkg.findname, deps=dep_cpp_info,
                               pkg=pkg,
                               build_type=bt.build_type,
                               deps_names=pkg.deps_names)
+        return dep_cpp_info
 
-    def generate_dependency_files(self, output_files: dict[str, str], pkg_name: str, cpp_info, buildtype_spec: BuildTypeSpec):
+    def generate_dependency_files(self, output_files: dict[str, str], pkg_name: str, cpp_info, buildtype_specs):
+        """
+        Renders the files of a package. The build type independent files are rendered for the
+        first build type spec only, the files of the other build types are added to them.
+        TargetFiles.cmake is rendered per output folder, see _render_target_files.
+        """
+        buildtype_spec = buildtype_specs[0]
         self._validate_components(cpp_info)
-        pkg = PackageSpec(pkg_name, self._get_filename(
-            cpp_info), self._get_name(cpp_info), cpp_info)
-
-        public_deps = self.get_public_deps(cpp_info)
-        deps_names = []
-        for it in public_deps:
-            name = "{}::{}".format(*self._get_require_name(*it))
-            if name not in deps_names:
-                deps_names.append(name)
-        pkg.deps_names = ';'.join(deps_names)
-        pkg.public_deps_filenames = [self._get_filename(self.deps_build_info[it[0]]) for it in
-                                     public_deps]
+        node = self.graph_index[pkg_name]
+        pkg = PackageSpec(pkg_name, node.filename, node.findname, cpp_info)
+        pkg.deps_names = ';'.join(node.deps_names)
+        pkg.public_deps_filenames = node.public_deps_filenames
         # Generate version file
         self._render_template('config_version.jinja', self._config_version_filename(pkg.filename), output_files,
                               version=pkg.version
@@ -371,22 +788,88 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
         if not cpp_info.components:
             self.generate_dependency_without_components(
                 cpp_info, pkg, buildtype_spec, output_files)
+            for other_spec in buildtype_specs[1:]:
+                self.generate_buildtype_without_components(
+                    cpp_info, pkg, other_spec, output_files)
         else:
             self.generate_dependency_with_components(
                 cpp_info, pkg, buildtype_spec, output_files)
+            for other_spec in buildtype_specs[1:]:
+                self.generate_buildtype_with_components(
+                    cpp_info, pkg, other_spec, output_files)
+
+    def _render_target_files(self, pkg_filename, output_files: dict[str, str]):
+        """
+        Explicit list of the per build type files, so the targets file does not need a glob.
+        It depends on the files of the output folder, so it is never stored in the render cache.
+        """
+        self._render_template('target_files.jinja', self._target_files_filename(pkg_filename), output_files,
+                              pkg_filename=pkg_filename,
+                              target_files=self._target_files(pkg_filename, output_files)
+                              )
 
     @property
     def content(self):
+        with self.trace.span('content'):
+            ret = self._shared_files()
+            dependencies = list(self.deps_build_info.dependencies)
+            buildtype_specs = self._buildtype_specs()
+            fingerprints = {}
+            if self.render_cache is not None:
+                fingerprints = {pkg_name: self._dependency_fingerprint(pkg_name, cpp_info,
+                                                                       buildtype_specs)
+                                for pkg_name, cpp_info in dependencies}
+            rendered, cached = self._cached_package_files(dependencies, buildtype_specs,
+                                                          fingerprints)
+            for generator_files in rendered.values():
+                ret.update(generator_files)
+            for cached_files in cached.values():
+                ret.update({generator_file: load(cached_file)
+                            for generator_file, cached_file in cached_files.items()})
+            for pkg_name, _ in dependencies:
+                self._render_target_files(self.graph_index[pkg_name].filename, ret)
+        self._save_snapshot()
+        self._save_trace()
+        return ret
+
+    def _shared_files(self) -> dict:
+        """Files that do not belong to a single package"""
         ret = {}
+        # Included by every generated file instead of defining the macros in each of them
+        self._render_template('conan_macros.jinja', CMakeData.macros_filename, ret,
+                              macros_version=self._macros_version)
+        return ret
+
+    def _buildtype_spec(self, build_type=None) -> BuildTypeSpec:
+        build_type = build_type or self.configuration
         buildtype_spec = BuildTypeSpec()
-        buildtype_spec.build_type = str(
-            self.conanfile.settings.build_type).upper()
+        buildtype_spec.build_type = build_type.upper()
         buildtype_spec.build_type_suffix = "_{}".format(
-            self.configuration.upper()) if self.configuration else ""
-
-        for pkg_name, cpp_info in self.deps_build_info.dependencies:
-            self.generate_dependency_files(
-                ret, pkg_name, cpp_info, buildtype_spec)
+            build_type.upper()) if build_type else ""
+        return buildtype_spec
+
+    def _buildtype_specs(self) -> list:
+        """Build types to generate files for, the one of the settings first"""
+        buildtype_specs = [self._buildtype_spec()]
+        if self.all_build_types:
+            buildtype_specs.extend(self._buildtype_spec(config) for config in self.configurations
+                                   if config != self.configuration)
+        return buildtype_specs
+
+    def _package_files(self, dependencies, buildtype_specs) -> dict:
+        """Renders the files of the given dependencies, per package name"""
+        ret = {}
+        build_types = ','.join(bt.build_type for bt in buildtype_specs)
+        with self.trace.span('deduce_all', build_type=build_types):
+            self._deduce_import_types(dependencies, buildtype_specs)
+        for pkg_name, cpp_info in dependencies:
+            ret[pkg_name] = {}
+            with self.trace.span('dependency', package=pkg_name, build_type=build_types):
+                self.generate_dependency_files(
+                    ret[pkg_name], pkg_name, cpp_info, buildtype_specs)
+        if self._library_deduce is not None:
+            with self.trace.span('save_deduction_cache'):
+                self._library_deduce.save_cache()
         return ret
 
     def _targets_filename(self, pkg_filename, build_type=None):
@@ -394,6 +877,18 @@ class CmakeConfigFindPackage(GeneratorComponentsMixin, Generator):
             return "{}Target.cmake".format(pkg_filename)
         return "{}Target-{}.cmake".format(pkg_filename, build_type)
 
+    def _target_files_filename(self, pkg_filename):
+        return "{}TargetFiles.cmake".format(pkg_filename)
+
+    def _target_files(self, pkg_filename, output_files: dict[str, str]):
+        """Per build type files of a package, generated now or by a run for another build type"""
+        target_files = []
+        for config in self.configurations:
+            target_file = self._targets_filename(pkg_filename, config.lower())
+            if target_file in output_files or os.path.exists(os.path.join(self.output_path, target_file)):
+                target_files.append(target_file)
+        return target_files
+
     def _config_filename(self, pkg_filename):
         if pkg_filename == pkg_filename.lower():
             return "{}-config.cmake".format(pkg_filename)
@@ -437,15 +932,33 @@ class CmakeConfigFindPackagePackage(ConanFile):
     url = "https://github.com/bacusters/customcmakegen"
     license = "MIT"
     exports = ['build_modules.jinja',
+               'CoffArchiveReader.py',
+               'conan_macros.jinja',
                'config_base.jinja',
                'config_components.jinja',
                'config_single.jinja',
                'config_version.jinja',
+               'DeductionCache.py',
+               'DependencyGraphIndex.py',
+               'DependencySnapshot.py',
+               'GenerationManifest.py',
+               'GeneratorTrace.py',
                'ImportLibraryTypeDeduction.py',
                'IndentedPrint.py',
+               'LibraryDirectoryIndex.py',
+               'LibraryFileReader.py',
+               'load_guard.jinja',
                'README.md',
+               'RenderCache.py',
+               'VcvarsEnvironment.py',
                'target_buildtype_base.jinja',
                'target_buildtype_components.jinja',
                'target_buildtype_single.jinja',
+               'target_files.jinja',
                'target_properties.jinja',
                'targets.jinja']
+
+    def export(self):
+        if get_env('CONAN_CFP_PRECOMPILE_TEMPLATES', False):
+            CmakeConfigFindPackage.precompile_templates(
+                os.path.join(self.export_folder, 'compiled_templates'))
@@ -0,0 +1,91 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# The generator lives at the root of the repository, the stand-in conanfile in benchmarks
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in (repository_folder, os.path.join(repository_folder, 'benchmarks')):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+
+from conans.model.build_info import CppInfo, DepCppInfo, DepsCppInfo  # noqa: E402
+from conans.util.files import save  # noqa: E402
+from synthetic_graph import SyntheticConanfile  # noqa: E402
+from conanfile import CmakeConfigFindPackage  # noqa: E402
+
+consumer = """cmake_minimum_required(VERSION 3.15)
+project(consumer NONE)
+set(CMAKE_BUILD_TYPE Release)
+list(APPEND CMAKE_PREFIX_PATH "{generated_folder}")
+find_package({package} CONFIG REQUIRED)
+if(NOT TARGET tool_module_target)
+    message(FATAL_ERROR "The build module of {package} was not included")
+endif()
+"""
+
+
+def declare_module(cpp_info, declare):
+    """Adds cmake/tool-module.cmake to cpp_info, the way given by declare"""
+    module = os.path.join('cmake', 'tool-module.cmake')
+    if declare == 'list':
+        cpp_info.build_modules = [module]
+    else:
+        cpp_info.build_modules[declare] = [module]
+    save(os.path.join(cpp_info.rootpath, module), 'add_library(tool_module_target INTERFACE)\n')
+    return os.path.join(cpp_info.rootpath, module).replace('\\', '/')
+
+
+def generate(tmp_path, cpp_info) -> str:
+    deps = DepsCppInfo()
+    deps.add(cpp_info.name, DepCppInfo(cpp_info))
+    generator = CmakeConfigFindPackage(SyntheticConanfile(deps, 'Release'))
+    generator.output_path = str(tmp_path / 'generated')
+    for file_name, content in generator.content.items():
+        save(os.path.join(generator.output_path, file_name), content)
+    return generator.output_path
+
+
+@pytest.fixture(autouse=True)
+def conan_user_home(tmp_path, monkeypatch):
+    # Keep the persistent caches of the generator out of the user home
+    monkeypatch.setenv('CONAN_USER_HOME', str(tmp_path / 'home'))
+
+
+@pytest.mark.parametrize('declare', ['list', 'cmake_find_package_multi',
+                                     'cmake_config_find_package'])
+def test_build_module_is_rendered(tmp_path, declare):
+    cpp_info = CppInfo('tool', str(tmp_path / 'tool'))
+    cpp_info.version = '1.0'
+    module = declare_module(cpp_info, declare)
+    generated_folder = generate(tmp_path, cpp_info)
+    with open(os.path.join(generated_folder, 'toolTarget-release.cmake'), encoding='utf-8') as f:
+        assert 'set(tool_BUILD_MODULES_PATHS_RELEASE "{}" )'.format(module) in f.read()
+
+
+def configure(tmp_path, cpp_info):
+    generated_folder = generate(tmp_path, cpp_info)
+    save(str(tmp_path / 'consumer' / 'CMakeLists.txt'),
+         consumer.format(generated_folder=generated_folder.replace('\\', '/'), package=cpp_info.name))
+    process = subprocess.run(['cmake', '-S', str(tmp_path / 'consumer'), '-B', str(tmp_path / 'build')],
+                             capture_output=True, encoding='utf-8')
+    assert process.returncode == 0, process.stdout + process.stderr
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None, reason='CMake is not installed')
+def test_build_module_is_included(tmp_path):
+    cpp_info = CppInfo('tool', str(tmp_path / 'tool'))
+    cpp_info.version = '1.0'
+    declare_module(cpp_info, 'cmake_find_package_multi')
+    configure(tmp_path, cpp_info)
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None, reason='CMake is not installed')
+def test_component_build_module_is_included_once(tmp_path):
+    cpp_info = CppInfo('tools', str(tmp_path / 'tools'))
+    cpp_info.version = '1.0'
+    declare_module(cpp_info.components['cli'], 'cmake_find_package_multi')
+    cpp_info.components['gui'].requires = ['cli']
+    configure(tmp_path, cpp_info)
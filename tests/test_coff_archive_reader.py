@@ -0,0 +1,71 @@
+"""
+The fixtures are small x86_64 archives made with the LLVM tools:
+
+    llvm-dlltool -m i386:x86-64 -d zlib1.def -l import_short_name.lib
+    llvm-dlltool -m i386:x86-64 -d long.def -l import_long_name.lib
+    llvm-mc -filetype=obj -triple x86_64-pc-windows-msvc f.s -o zlib.obj
+    llvm-lib /out:static.lib zlib.obj
+    llvm-lib /out:static_long_name.lib a_long_object_file_name.obj
+    head -c 400 import_short_name.lib > truncated.lib
+
+zlib1.def exports deflate and inflate from zlib1.dll, long.def exports foo from
+a_very_long_dll_name_that_exceeds_sixteen_chars.dll and f.s holds a single function.
+"""
+import os
+import sys
+
+import pytest
+
+# The reader lives at the root of the repository
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repository_folder not in sys.path:
+    sys.path.insert(0, repository_folder)
+
+from CoffArchiveReader import CoffArchiveError, CoffArchiveReader  # noqa: E402
+
+fixtures_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'coff')
+
+
+def read_fixture(file_name: str):
+    return CoffArchiveReader(os.path.join(fixtures_folder, file_name)).read_import_info()
+
+
+@pytest.mark.parametrize('file_name, dll_name', [
+    # Member names fit in the header, no long names table
+    ('import_short_name.lib', 'zlib1.dll'),
+    # Member names are offsets in the long names table
+    ('import_long_name.lib', 'a_very_long_dll_name_that_exceeds_sixteen_chars.dll'),
+])
+def test_import_library(file_name, dll_name):
+    assert read_fixture(file_name) == (dll_name, dll_name)
+
+
+@pytest.mark.parametrize('file_name, first_member', [
+    ('static.lib', 'zlib.obj'),
+    ('static_long_name.lib', 'a_long_object_file_name.obj'),
+])
+def test_static_library(file_name, first_member):
+    assert read_fixture(file_name) == (first_member, None)
+
+
+def test_truncated_member():
+    with pytest.raises(CoffArchiveError, match='truncated'):
+        read_fixture('truncated.lib')
+
+
+@pytest.mark.parametrize('size', [8, 8 + 30, 8 + 60 + 5])
+def test_truncated_header(tmp_path, size):
+    with open(os.path.join(fixtures_folder, 'static.lib'), 'rb') as f:
+        data = f.read()
+    lib_path = tmp_path / 'truncated.lib'
+    lib_path.write_bytes(data[:size])
+    with pytest.raises(CoffArchiveError):
+        CoffArchiveReader(str(lib_path)).read_import_info()
+
+
+@pytest.mark.parametrize('content', [b'', b'not an archive', b'!<arch>\n' + b'x' * 60])
+def test_corrupt(tmp_path, content):
+    lib_path = tmp_path / 'corrupt.lib'
+    lib_path.write_bytes(content)
+    with pytest.raises(CoffArchiveError):
+        CoffArchiveReader(str(lib_path)).read_import_info()
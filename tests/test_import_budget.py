@@ -0,0 +1,34 @@
+import os
+import statistics
+import sys
+
+import pytest
+
+# The measurement is shared with benchmarks/bench_import.py
+benchmarks_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'benchmarks')
+if benchmarks_folder not in sys.path:
+    sys.path.insert(0, benchmarks_folder)
+
+import bench_import  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def runs():
+    """Imports of conanfile.py, each in a fresh interpreter"""
+    return [bench_import.measure() for _ in range(5)]
+
+
+def test_import_within_budget(runs):
+    median_ms = statistics.median(run['duration'] for run in runs) * 1000
+    assert median_ms <= bench_import.budget_ms
+
+
+def test_import_prints_nothing(runs):
+    assert runs[0]['output'] == ''
+
+
+@pytest.mark.parametrize('module', bench_import.lazy_modules)
+def test_import_is_lazy(runs, module):
+    # Modules the Conan client loaded before do not count, its generators import jinja2
+    assert module not in runs[0]['imported'] or module in runs[0]['before']
@@ -0,0 +1,122 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# The generator lives at the root of the repository, the stand-in conanfile in benchmarks
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in (repository_folder, os.path.join(repository_folder, 'benchmarks')):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+
+from LibraryDirectoryIndex import LibraryDirectoryIndex  # noqa: E402
+
+windows = dict(is_windows=True, is_macos=False)
+macos = dict(is_windows=False, is_macos=True)
+linux = dict(is_windows=False, is_macos=False)
+
+find_library_cmake = """cmake_minimum_required(VERSION 3.15)
+project(find NONE)
+find_library(FOUND NAMES {lib} PATHS "{libdir}" NO_DEFAULT_PATH NO_CMAKE_FIND_ROOT_PATH)
+file(WRITE "{result}" "${{FOUND}}")
+"""
+
+# Library names and the files of their directory, for the platform CMake runs on
+host_layouts = [
+    ('bar', ['libbar.so.1', 'libbar.a']),
+    ('bar', ['libbar.so', 'libbar.so.1', 'libbar.a']),
+    ('bar', ['libbar.a', 'bar.a']),
+    ('bar', ['bar.so']),
+    ('bar', ['libbar.so.1']),
+    ('libbar.so.1', ['libbar.so.1', 'libbar.so']),
+    ('bar.a', ['bar.a', 'libbar.a']),
+]
+
+
+def touch(folder, file_names):
+    os.makedirs(folder, exist_ok=True)
+    for file_name in file_names:
+        with open(os.path.join(folder, file_name), 'wb'):
+            pass
+    return folder
+
+
+@pytest.mark.parametrize('platform, lib, files, found', [
+    # MSVC libraries first, then MinGW import libraries and archives
+    (windows, 'foo', ['libfoo.dll.a', 'foo.lib', 'libfoo.a'], ['foo.lib', 'libfoo.dll.a', 'libfoo.a']),
+    (linux, 'bar', ['libbar.a', 'libbar.so.1', 'libbar.so'], ['libbar.so', 'libbar.a']),
+    (macos, 'bar', ['libbar.a', 'libbar.1.dylib'], ['libbar.1.dylib', 'libbar.a']),
+])
+def test_find_order(tmp_path, platform, lib, files, found):
+    libdir = touch(str(tmp_path), files)
+    assert LibraryDirectoryIndex(**platform).find(lib, [libdir]) == \
+        [os.path.join(libdir, f) for f in found]
+
+
+@pytest.mark.parametrize('platform, lib, files, found', [
+    (windows, 'foo', ['libfoo.dll.a', 'foo.lib'], 'foo.lib'),
+    (windows, 'foo', ['libfoo.dll.a', 'libfoo.a'], None),
+    (windows, 'Foo', ['foo.LIB'], 'foo.LIB'),
+    (linux, 'bar', ['libbar.so.1', 'libbar.a'], 'libbar.a'),
+    (linux, 'bar', ['libbar.so', 'libbar.a'], 'libbar.so'),
+    (macos, 'bar', ['libbar.a', 'libbar.dylib', 'libbar.tbd'], 'libbar.tbd'),
+    (macos, 'bar', ['libbar.1.dylib', 'libbar.a'], 'libbar.a'),
+])
+def test_find_library(tmp_path, platform, lib, files, found):
+    libdir = touch(str(tmp_path), files)
+    expected = os.path.join(libdir, found) if found else None
+    assert LibraryDirectoryIndex(**platform).find_library(lib, [libdir]) == expected
+
+
+def test_find_library_first_libdir(tmp_path):
+    first = touch(str(tmp_path / 'first'), ['libbar.a'])
+    second = touch(str(tmp_path / 'second'), ['libbar.so'])
+    assert LibraryDirectoryIndex(**linux).find_library('bar', [first, second]) == \
+        os.path.join(first, 'libbar.a')
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None or sys.platform == 'win32',
+                    reason='CMake is not installed, or uses MSVC naming')
+@pytest.mark.parametrize('lib, files', host_layouts)
+def test_find_library_like_cmake(tmp_path, lib, files):
+    libdir = touch(str(tmp_path / 'lib'), files)
+    result = str(tmp_path / 'found.txt')
+    source_folder = str(tmp_path / 'source')
+    os.makedirs(source_folder)
+    with open(os.path.join(source_folder, 'CMakeLists.txt'), 'w', encoding='utf-8') as f:
+        f.write(find_library_cmake.format(lib=lib, libdir=libdir.replace('\\', '/'),
+                                          result=result.replace('\\', '/')))
+    process = subprocess.run(['cmake', '-S', source_folder, '-B', str(tmp_path / 'build')],
+                             capture_output=True, encoding='utf-8')
+    assert process.returncode == 0, process.stdout + process.stderr
+    with open(result, encoding='utf-8') as f:
+        cmake_found = f.read()
+    index = LibraryDirectoryIndex(is_windows=False, is_macos=sys.platform == 'darwin')
+    found = index.find_library(lib, [libdir])
+    assert (found or 'FOUND-NOTFOUND') == cmake_found
+
+
+@pytest.mark.skipif(sys.platform in ('win32', 'darwin'), reason='Writes ELF shared objects')
+def test_resolved_paths(tmp_path, monkeypatch):
+    from conans.model.build_info import CppInfo, DepCppInfo, DepsCppInfo
+    from synthetic_graph import SyntheticConanfile, shared_object, static_archive
+    from conanfile import CmakeConfigFindPackage
+
+    monkeypatch.setenv('CONAN_USER_HOME', str(tmp_path / 'home'))
+    monkeypatch.setenv('CONAN_CFP_RESOLVED_LIBRARY_PATHS', '1')
+    libdir = tmp_path / 'bar' / 'lib'
+    libdir.mkdir(parents=True)
+    (libdir / 'libbar.so.1').write_bytes(shared_object())
+    (libdir / 'libbar.a').write_bytes(static_archive('bar.o'))
+    cpp_info = CppInfo('bar', str(tmp_path / 'bar'))
+    cpp_info.libs = ['bar']
+    cpp_info.version = '1.0'
+    deps = DepsCppInfo()
+    deps.add('bar', DepCppInfo(cpp_info))
+    generator = CmakeConfigFindPackage(SyntheticConanfile(deps, 'Release'))
+    generator.output_path = str(tmp_path / 'generated')
+    content = generator.content['barTarget-release.cmake']
+    # find_library does not look at libbar.so.1, the archive is what it links
+    assert 'RESOLVED_PATHS  "{}"'.format(str(libdir / 'libbar.a')) in content